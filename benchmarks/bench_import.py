@@ -0,0 +1,16 @@
+"""
+Benchmarks for the time and memory it takes to import ndx_photostim, e.g., in workers that only read NWB files.
+"""
+
+
+class ImportSuite:
+    """
+    Import ndx_photostim in a fresh interpreter, so that modules imported by earlier benchmarks are not reused.
+    """
+
+    def timeraw_import_ndx_photostim(self):
+        return "import ndx_photostim"
+
+    def timeraw_import_pynwb(self):
+        # baseline for the time ndx_photostim adds on top of pynwb
+        return "import pynwb"
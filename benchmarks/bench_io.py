@@ -0,0 +1,57 @@
+"""
+Benchmarks for writing and reading NWB files with many PhotostimulationSeries.
+"""
+import os
+
+import numpy as np
+from pynwb import NWBHDF5IO
+
+from .common import make_nwbfile
+
+
+class IOSuite:
+    """
+    Write an NWBFile with an increasing number of series and a PhotostimulationTable referencing them, and read it
+    back, resolving the series in the table.
+    """
+    params = [10 ** 3, 10 ** 4, 10 ** 5]
+    param_names = ['num_series']
+    timeout = 3600
+    # an NWBFile can be written once, so every sample needs a fresh one from setup, without warmup runs
+    number = 1
+    repeat = 3
+    warmup_time = 0
+
+    def setup_cache(self):
+        paths = {}
+        for num_series in self.params:
+            paths[num_series] = f'read_{num_series}.nwb'
+            with NWBHDF5IO(paths[num_series], 'w') as io:
+                io.write(make_nwbfile(num_series))
+        return paths
+
+    def setup(self, paths, num_series):
+        self.nwbfile = make_nwbfile(num_series)
+        self.path = f'write_{num_series}.nwb'
+
+    def teardown(self, paths, num_series):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def time_write(self, paths, num_series):
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(self.nwbfile)
+
+    def peakmem_write(self, paths, num_series):
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(self.nwbfile)
+
+    def time_read(self, paths, num_series):
+        with NWBHDF5IO(paths[num_series], 'r', load_namespaces=True) as io:
+            table = io.read().processing['photostim']['photostim_table']
+            np.sum([len(series.timestamps[:]) for series in table.series[:]])
+
+    def peakmem_read(self, paths, num_series):
+        with NWBHDF5IO(paths[num_series], 'r', load_namespaces=True) as io:
+            table = io.read().processing['photostim']['photostim_table']
+            np.sum([len(series.timestamps[:]) for series in table.series[:]])
@@ -0,0 +1,39 @@
+"""
+Benchmarks for converting between the 'pixel_roi' and 'image_mask_roi' representations of a HolographicPattern.
+"""
+from .common import make_pattern
+
+
+class MaskConversionSuite:
+    """
+    Rasterize patterns with an increasing number of ROIs on fields of view of increasing size, and convert the
+    resulting masks back to pixel lists.
+    """
+    params = ([512, 2048], [10, 100, 1000])
+    param_names = ['dimension', 'num_rois']
+
+    def setup(self, dimension, num_rois):
+        self.pattern = make_pattern(dimension, num_rois)
+        self.mask = self.pattern.pixel_to_image_mask_roi()
+
+    def teardown(self, dimension, num_rois):
+        self.pattern.clear_mask_cache()
+
+    def time_pixel_to_image_mask_roi(self, dimension, num_rois):
+        # the mask is cached, so measure the rasterization itself
+        self.pattern.clear_mask_cache()
+        self.pattern.pixel_to_image_mask_roi()
+
+    def peakmem_pixel_to_image_mask_roi(self, dimension, num_rois):
+        self.pattern.clear_mask_cache()
+        self.pattern.pixel_to_image_mask_roi()
+
+    def time_pixel_to_image_mask_roi_label(self, dimension, num_rois):
+        self.pattern.clear_mask_cache()
+        self.pattern.pixel_to_image_mask_roi(output='label')
+
+    def time_image_to_pixel(self, dimension, num_rois):
+        self.pattern.image_to_pixel(self.mask)
+
+    def peakmem_image_to_pixel(self, dimension, num_rois):
+        self.pattern.image_to_pixel(self.mask)
@@ -0,0 +1,62 @@
+"""
+Benchmarks for constructing PhotostimulationSeries and adding presentations to them.
+"""
+import numpy as np
+from ndx_photostim import PhotostimulationSeries
+
+from .common import make_pattern, make_onsets
+
+
+class SeriesSuite:
+    """
+    Construct series in both formats from a given number of presentations, and add the same presentations to an empty
+    series.
+    """
+    params = [10 ** 3, 10 ** 5, 10 ** 7]
+    param_names = ['num_presentations']
+
+    def setup(self, num_presentations):
+        self.pattern = make_pattern()
+        onsets = make_onsets(num_presentations)
+        self.onsets = onsets
+        self.interval_data = np.tile(np.array([1, -1], dtype=np.int8), num_presentations)
+        self.interval_timestamps = np.column_stack((onsets, onsets + 0.05)).ravel()
+        self.series_data = np.ones(num_presentations, dtype=np.int8)
+
+    def _empty_series(self):
+        return PhotostimulationSeries(name='series', format='interval', stim_duration=0.05, pattern=self.pattern)
+
+    def time_init_interval(self, num_presentations):
+        PhotostimulationSeries(name='series', format='interval', data=self.interval_data,
+                               timestamps=self.interval_timestamps, stim_duration=0.05, pattern=self.pattern)
+
+    def peakmem_init_interval(self, num_presentations):
+        PhotostimulationSeries(name='series', format='interval', data=self.interval_data,
+                               timestamps=self.interval_timestamps, stim_duration=0.05, pattern=self.pattern)
+
+    def time_init_series(self, num_presentations):
+        PhotostimulationSeries(name='series', format='series', data=self.series_data, timestamps=self.onsets,
+                               stim_duration=0.05, pattern=self.pattern)
+
+    def time_add_onset(self, num_presentations):
+        self._empty_series().add_onset(self.onsets)
+
+    def peakmem_add_onset(self, num_presentations):
+        self._empty_series().add_onset(self.onsets)
+
+
+class IncrementalOnsetSuite:
+    """
+    Add presentations to a series one at a time, as acquisition code does while an experiment is running.
+    """
+    params = [10 ** 2, 10 ** 3, 10 ** 4]
+    param_names = ['num_presentations']
+
+    def setup(self, num_presentations):
+        self.pattern = make_pattern()
+        self.onsets = make_onsets(num_presentations).tolist()
+
+    def time_add_onset(self, num_presentations):
+        series = PhotostimulationSeries(name='series', format='interval', stim_duration=0.05, pattern=self.pattern)
+        for onset in self.onsets:
+            series.add_onset(onset)
@@ -0,0 +1,33 @@
+"""
+Benchmarks for building and plotting a PhotostimulationTable with many series.
+"""
+from .common import make_pattern, make_series, make_table
+
+
+class TableSuite:
+    """
+    Add an increasing number of series to a PhotostimulationTable and plot their presentation times.
+    """
+    params = [10 ** 3, 10 ** 4, 10 ** 5]
+    param_names = ['num_series']
+    timeout = 3600
+
+    def setup(self, num_series):
+        self.series = make_series(num_series, pattern=make_pattern())
+        self.table = make_table(self.series)
+
+    def teardown(self, num_series):
+        import matplotlib.pyplot as plt
+        plt.close('all')
+
+    def time_add_series(self, num_series):
+        make_table(self.series)
+
+    def peakmem_add_series(self, num_series):
+        make_table(self.series)
+
+    def time_plot_presentation_times(self, num_series):
+        self.table.plot_presentation_times().figure.canvas.draw()
+
+    def time_plot_presentation_times_zoomed(self, num_series):
+        self.table.plot_presentation_times(xlim=[0, 10]).figure.canvas.draw()
@@ -0,0 +1,66 @@
+"""
+Containers shared by the benchmarks, sized to match production recordings rather than the toy examples in the tests.
+"""
+from datetime import datetime
+
+import numpy as np
+from dateutil.tz import tzlocal
+from ndx_photostim import PhotostimulationMethod, HolographicPattern, PhotostimulationSeries, PhotostimulationTable
+from pynwb import NWBFile
+
+
+def make_pattern(dimension=512, num_rois=50, roi_size=10, seed=0):
+    """
+    Return a HolographicPattern with 'num_rois' circular ROIs at random positions in a square field of view.
+    """
+    rng = np.random.default_rng(seed)
+    return HolographicPattern(name='pattern', pixel_roi=rng.uniform(0, dimension, size=(num_rois, 2)),
+                              roi_size=roi_size, dimension=[dimension, dimension],
+                              method=PhotostimulationMethod(name='method'))
+
+
+def make_onsets(num_presentations, stim_duration=0.05, seed=0):
+    """
+    Return increasing onset times of 'num_presentations' non-overlapping presentations of length 'stim_duration'.
+    """
+    rng = np.random.default_rng(seed)
+    return np.cumsum(stim_duration + rng.exponential(1., size=num_presentations))
+
+
+def make_series(num_series, num_presentations=20, pattern=None):
+    """
+    Return 'num_series' interval-format PhotostimulationSeries sharing a single pattern.
+    """
+    pattern = make_pattern() if pattern is None else pattern
+    series = []
+    for i in range(num_series):
+        onsets = make_onsets(num_presentations, seed=i)
+        series.append(PhotostimulationSeries(name=f'series_{i}', format='interval',
+                                             data=np.tile(np.array([1, -1], dtype=np.int8), num_presentations),
+                                             timestamps=np.column_stack((onsets, onsets + 0.05)).ravel(),
+                                             stim_duration=0.05, pattern=pattern))
+    return series
+
+
+def make_table(series):
+    """
+    Return a PhotostimulationTable with one row per series.
+    """
+    table = PhotostimulationTable(name='photostim_table', description='benchmark table')
+    table.add_series(series)
+    return table
+
+
+def make_nwbfile(num_series, num_presentations=20):
+    """
+    Return an NWBFile with 'num_series' PhotostimulationSeries as stimuli and a PhotostimulationTable referencing
+    them in a processing module.
+    """
+    nwbfile = NWBFile(session_description='benchmark', identifier='benchmark',
+                      session_start_time=datetime(2024, 1, 1, tzinfo=tzlocal()))
+    series = make_series(num_series, num_presentations)
+    for s in series:
+        nwbfile.add_stimulus(s)
+    module = nwbfile.create_processing_module(name='photostim', description='photostimulation')
+    module.add(make_table(series))
+    return nwbfile
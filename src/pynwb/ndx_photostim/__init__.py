@@ -25,4 +25,10 @@ load_namespaces(ndx_photostim_specpath)
 # SpatialLightModulator = get_class('SpatialLightModulator', 'ndx-photostim')
 
 from .photostim import SpatialLightModulator, Laser, PhotostimulationMethod, HolographicPattern, \
-                             PhotostimulationSeries, PhotostimulationTable
+                             PhotostimulationSeries, PhotostimulationTable, PatternRegistry, \
+                             HolographicPatternTable, PhotostimulationEventTable
+
+# instrument the containers if profiling was requested, without importing the profiler otherwise
+if os.environ.get('NDX_PHOTOSTIM_PROFILE'):
+    from .profiling import _profile_from_environment
+    _profile_from_environment()
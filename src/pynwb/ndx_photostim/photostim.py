@@ -1,8 +1,15 @@
+import hashlib
+import uuid
+import warnings
+import weakref
+from collections import OrderedDict
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 
-import matplotlib.pyplot as plt
+import h5py
 import numpy as np
-import pandas as pd
+from hdmf.backends.hdf5 import H5DataIO
+from hdmf.data_utils import AbstractDataChunkIterator, DataIO, extend_data
 from hdmf.utils import docval, getargs, popargs, popargs_to_dict, get_docval
 from pynwb import register_class
 from pynwb.base import TimeSeries
@@ -12,6 +19,432 @@ from pynwb.file import NWBContainer
 
 namespace = 'ndx-photostim'
 
+
+class _LRUCache:
+    """
+    Least-recently-used cache bounded by both the number of entries and their total size in bytes.
+    """
+
+    def __init__(self, maxsize=128, max_bytes=2 ** 28):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.__entries = OrderedDict()
+        self.__nbytes = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    @property
+    def nbytes(self):
+        return self.__nbytes
+
+    def get(self, key, default=None):
+        if key not in self.__entries:
+            return default
+        self.__entries.move_to_end(key)
+        return self.__entries[key][0]
+
+    def put(self, key, value):
+        self.pop(key)
+        nbytes = self._sizeof(value)
+        self.__entries[key] = (value, nbytes)
+        self.__nbytes += nbytes
+        while len(self.__entries) > 1 and (len(self.__entries) > self.maxsize or self.__nbytes > self.max_bytes):
+            self.__nbytes -= self.__entries.popitem(last=False)[1][1]
+
+    def pop(self, key):
+        if key in self.__entries:
+            self.__nbytes -= self.__entries.pop(key)[1]
+
+    def clear(self):
+        self.__entries.clear()
+        self.__nbytes = 0
+
+    @staticmethod
+    def _sizeof(value):
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        if isinstance(value, (list, tuple)):
+            return sum(_LRUCache._sizeof(v) for v in value)
+        if hasattr(value, 'data') and hasattr(value, 'row'):  # scipy.sparse COO matrix
+            return value.data.nbytes + value.row.nbytes + value.col.nbytes
+        return 0
+
+
+class _GrowableArray:
+    """
+    Array that grows along its first axis by amortized doubling of its capacity, with each row of shape
+    'item_shape' (1D by default). 'view' returns the filled part of the buffer without copying it.
+    """
+
+    def __init__(self, values=(), dtype=float, capacity=16, item_shape=()):
+        values = np.asarray(values, dtype=dtype).reshape((-1,) + tuple(item_shape))
+        self.__buffer = np.empty((max(len(values), capacity),) + tuple(item_shape), dtype=dtype)
+        self.__buffer[:len(values)] = values
+        self.__size = len(values)
+
+    def __len__(self):
+        return self.__size
+
+    @property
+    def dtype(self):
+        return self.__buffer.dtype
+
+    @property
+    def view(self):
+        return self.__buffer[:self.__size]
+
+    def reserve(self, capacity):
+        """
+        Ensure the buffer can hold at least 'capacity' values, at least doubling its size when it grows.
+        """
+        if capacity > len(self.__buffer):
+            buffer = np.empty((max(capacity, 2 * len(self.__buffer)),) + self.__buffer.shape[1:],
+                              dtype=self.__buffer.dtype)
+            buffer[:self.__size] = self.__buffer[:self.__size]
+            self.__buffer = buffer
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.__buffer.dtype).reshape((-1,) + self.__buffer.shape[1:])
+        self.reserve(self.__size + len(values))
+        self.__buffer[self.__size:self.__size + len(values)] = values
+        self.__size += len(values)
+
+
+# growable buffers holding the values of table columns kept as arrays in memory, and the views set as column data,
+# by id of the column, since some columns are not hashable
+_column_buffers = {}
+
+
+def _extend_columns(table, columns):
+    """
+    Add rows to a DynamicTable, given the values of each column, and give the rows consecutive ids. Columns given as
+    lists are extended in place. Columns given as arrays are kept in memory as the view of a growable buffer, so that
+    adding rows does not copy the rows already in the table, and are written without converting each value. Ragged
+    columns are given by name, as a tuple of the values and their number per row.
+    """
+    num_rows = None
+    updates = []
+    for name, values in columns.items():
+        if isinstance(values, tuple):
+            values, counts = values
+            index = table[name]
+            ends = np.cumsum(counts, dtype=np.uint64) + len(index.target)
+            updates += [(index.target, values), (index, ends.astype(np.uint32 if ends[-1] < 2 ** 32 else np.uint64))]
+            num_rows = len(counts)
+        else:
+            updates.append((table[name], values))
+            num_rows = len(values)
+    updates.append((table.id, np.arange(len(table), len(table) + num_rows)))
+
+    for column, values in updates:
+        if isinstance(values, np.ndarray) and isinstance(column.data, (list, np.ndarray)):
+            buffer, view = _column_buffers.get(id(column), (None, None))
+            if view is None or column.data is not view or np.promote_types(buffer.dtype, values.dtype) != buffer.dtype:
+                buffer = _GrowableArray(np.asarray(column.data, dtype=values.dtype), dtype=values.dtype,
+                                        item_shape=values.shape[1:])
+                if view is None:
+                    weakref.finalize(column, _column_buffers.pop, id(column), None)
+            buffer.extend(values)
+            view = buffer.view
+            _column_buffers[id(column)] = (buffer, view)
+            column.transform(lambda data: view)
+        else:
+            column.transform(lambda data, values=values: extend_data(data, values))
+
+
+class _ValidatingChunkIterator(AbstractDataChunkIterator):
+    """
+    Wrap a data chunk iterator, checking the data of each chunk with 'check' as it is read.
+    """
+
+    def __init__(self, iterator, check):
+        self.__iterator = iterator
+        self.__check = check
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = next(self.__iterator)
+        if chunk is not None and chunk.data is not None:
+            self.__check(np.asarray(chunk.data))
+        return chunk
+
+    def recommended_chunk_shape(self):
+        return self.__iterator.recommended_chunk_shape()
+
+    def recommended_data_shape(self):
+        return self.__iterator.recommended_data_shape()
+
+    @property
+    def dtype(self):
+        return self.__iterator.dtype
+
+    @property
+    def maxshape(self):
+        return self.__iterator.maxshape
+
+
+class _PresentationValidator:
+    """
+    Single-pass check of the 'data' and 'timestamps' of a PhotostimulationSeries. Values can be checked all at once or
+    in consecutive chunks, and 'data' and 'timestamps' are checked independently of each other, so that both can be
+    read from iterators. Data must be -1 or 1 and alternate between onsets and offsets, starting with an onset
+    ('interval' format), or be 0 or 1 ('series' format). Timestamps of onsets must be in increasing order, and each
+    offset must not precede its onset ('interval' format), or all timestamps must be in increasing order ('series'
+    format).
+
+    Earlier versions accepted 'interval' data starting with an offset, so such data only raise a warning, and their
+    timestamps, which can't be paired into presentations, are not checked.
+    """
+
+    block_size = 2 ** 20
+
+    def __init__(self, format):
+        self.format = format
+        self.__last_value = None
+        self.__num_timestamps = 0
+        self.__last_timestamp = -np.inf
+        self.__open_onset = None
+        self.__offset_first = False
+
+    def check_data(self, data):
+        data = np.asarray(data).ravel()
+        if len(data) == 0:
+            return
+        if self.format == 'interval':
+            if not np.all((data == 1) | (data == -1)):
+                raise ValueError("'interval' data must be either -1 (offset) or 1 (onset).")
+            first = -1 if self.__last_value is None else self.__last_value
+            if self.__last_value is None and data[0] == -1:
+                warnings.warn("'interval' data should start with 1 (onset) rather than -1 (offset); the timestamps of "
+                              "the presentations are not checked.", stacklevel=2)
+                self.__offset_first = True
+                first = 1
+            if data[0] != -first or np.any(data[1:] != -data[:-1]):
+                raise ValueError("'interval' data must alternate between 1 (onset) and -1 (offset), starting with "
+                                 "an onset.")
+        elif not np.all((data == 1) | (data == 0)):
+            raise ValueError("'series' data must be either 0 or 1.")
+        self.__last_value = data[-1]
+
+    def check_timestamps(self, timestamps):
+        timestamps = np.asarray(timestamps, dtype=np.float64).ravel()
+        if len(timestamps) == 0:
+            return
+        if self.__offset_first:
+            return
+        if self.format == 'series':
+            if timestamps[0] < self.__last_timestamp or np.any(timestamps[1:] < timestamps[:-1]):
+                raise ValueError("'timestamps' must be in increasing order.")
+            self.__last_timestamp = timestamps[-1]
+            return
+
+        # onsets are at even positions in the series; start from the onset of an interval left open by the last chunk
+        if self.__open_onset is not None:
+            timestamps = np.concatenate(([self.__open_onset], timestamps))
+        onsets, offsets = timestamps[0::2], timestamps[1::2]
+        if onsets[0] < self.__last_timestamp or np.any(onsets[1:] < onsets[:-1]):
+            raise ValueError("'timestamps' of onsets must be in increasing order.")
+        if np.any(offsets < onsets[:len(offsets)]):
+            raise ValueError("'timestamps' of each offset must not precede its onset.")
+        self.__last_timestamp = onsets[-1]
+        self.__open_onset = timestamps[-1] if len(timestamps) % 2 else None
+
+    def validate(self, data, timestamps):
+        """
+        Check 'data' and 'timestamps', returning them with any iterators wrapped so that each chunk is checked as it
+        is read. Datasets are read and checked in blocks.
+        """
+        return self.__validate(data, self.check_data), self.__validate(timestamps, self.check_timestamps)
+
+    def __validate(self, values, check):
+        if isinstance(values, AbstractDataChunkIterator):
+            return _ValidatingChunkIterator(values, check)
+        array = values.data if isinstance(values, DataIO) else values
+        if array is None or isinstance(array, (TimeSeries, AbstractDataChunkIterator)):
+            return values
+        block_size = len(array) if isinstance(array, np.ndarray) else self.block_size
+        for start in range(0, len(array), max(block_size, 1)):
+            check(array[start:start + block_size])
+        return values
+
+
+class _IntervalIndex:
+    """
+    Presentation intervals sorted by start time, with the running maximum of their stop times, for binary search of
+    the intervals that are on at a given time or overlap a time window. Intervals are half-open, [start, stop).
+    """
+
+    def __init__(self, starts, stops):
+        starts = np.asarray(starts, dtype=np.float64)
+        stops = np.asarray(stops, dtype=np.float64)
+        if np.any(starts[1:] < starts[:-1]):
+            order = np.argsort(starts, kind='stable')
+            starts, stops = starts[order], stops[order]
+        self.starts = starts
+        self.stops = stops
+        self.max_stops = np.maximum.accumulate(stops) if len(stops) > 0 else stops
+
+    def is_on(self, times):
+        times = np.asarray(times, dtype=np.float64)
+        if len(self.starts) == 0:
+            return np.zeros(times.shape, dtype=bool)
+        # the stimulus is on if any interval starting at or before the time stops after it
+        last = np.searchsorted(self.starts, times, side='right') - 1
+        return (last >= 0) & (self.max_stops[np.maximum(last, 0)] > times)
+
+    def intervals_in(self, t0, t1):
+        # intervals starting before t1, from the first that could stop after t0
+        lo = np.searchsorted(self.max_stops, t0, side='right')
+        hi = np.searchsorted(self.starts, t1, side='left')
+        starts, stops = self.starts[lo:hi], self.stops[lo:hi]
+        overlapping = stops > t0
+        return np.column_stack((starts[overlapping], stops[overlapping]))
+
+
+class _BucketedIntervalIndex:
+    """
+    Intervals labeled with the table row they belong to, grouped into buckets of durations within a factor of two of
+    each other and sorted by start time within each bucket. An interval that is on at time t starts after t minus the
+    longest duration in its bucket, so each bucket is searched with a binary search for the candidate range followed
+    by a check of the stop times of the candidates only.
+    """
+
+    def __init__(self, starts, stops, rows):
+        starts = np.asarray(starts, dtype=np.float64)
+        stops = np.asarray(stops, dtype=np.float64)
+        rows = np.asarray(rows, dtype=np.int64)
+        classes = np.frexp(stops - starts)[1]
+        self.buckets = []
+        for duration_class in np.unique(classes):
+            selected = np.flatnonzero(classes == duration_class)
+            selected = selected[np.argsort(starts[selected], kind='stable')]
+            self.buckets.append(((stops[selected] - starts[selected]).max(), starts[selected], stops[selected],
+                                 rows[selected]))
+
+    def query(self, lo, hi, side):
+        """
+        Rows with an interval that stops after 'lo' and starts before 'hi' (side='left') or at or before 'hi'
+        (side='right'), for each pair of bounds. Returns a list with a sorted array of unique rows for each pair.
+        """
+        matched_queries, matched_rows = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        for max_duration, starts, stops, rows in self.buckets:
+            first = np.searchsorted(starts, lo - max_duration, side='right')
+            counts = np.maximum(np.searchsorted(starts, hi, side=side) - first, 0)
+            if counts.sum() == 0:
+                continue
+            # expand the candidate range of each query into one array of interval indices
+            queries = np.repeat(np.arange(len(lo)), counts)
+            candidates = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - first, counts)
+            matched = stops[candidates] > lo[queries]
+            matched_queries.append(queries[matched])
+            matched_rows.append(rows[candidates[matched]])
+
+        queries, rows = np.concatenate(matched_queries), np.concatenate(matched_rows)
+        order = np.lexsort((rows, queries))
+        queries, rows = queries[order], rows[order]
+        distinct = np.ones(len(rows), dtype=bool)
+        distinct[1:] = (queries[1:] != queries[:-1]) | (rows[1:] != rows[:-1])
+        queries, rows = queries[distinct], rows[distinct]
+        return np.split(rows, np.searchsorted(queries, np.arange(1, len(lo))))
+
+
+class _EventStream:
+    """
+    Pair of resizable 1D datasets that values are appended to in chunks. Appended values are buffered in memory and
+    written once 'chunk_size' of them are pending, so memory use does not grow with the number of values. Until the
+    file is written, the datasets are empty H5DataIO placeholders that are created on write. Values still pending
+    once the datasets are written are reported with a warning when the stream is garbage collected.
+    """
+
+    def __init__(self, data, timestamps, chunk_size):
+        self.data_io = data
+        self.timestamps_io = timestamps
+        self.chunk_size = chunk_size
+        self.__pending_data = _GrowableArray(dtype=np.int8, capacity=chunk_size)
+        self.__pending_timestamps = _GrowableArray(dtype=np.float64, capacity=chunk_size)
+
+    @classmethod
+    def create(cls, chunk_size):
+        stream = cls(None, None, chunk_size)
+        stream.data_io, stream.timestamps_io = (
+            _StreamDataIO(stream, data=None, dtype=dtype, shape=(0,), maxshape=(None,), chunks=(chunk_size,))
+            for dtype in (np.int8, np.float64))
+        return stream
+
+    @staticmethod
+    def is_resizable(dataset):
+        return (isinstance(dataset, h5py.Dataset) and dataset.maxshape == (None,)
+                and dataset.file.mode != 'r')
+
+    @property
+    def datasets(self):
+        """
+        The written datasets, or None if the file has not been written yet.
+        """
+        datasets = tuple(d.dataset if isinstance(d, DataIO) else d for d in (self.data_io, self.timestamps_io))
+        return None if any(d is None for d in datasets) else datasets
+
+    @property
+    def pending(self):
+        return self.__pending_data.view, self.__pending_timestamps.view
+
+    def extend(self, data, timestamps):
+        self.__pending_data.extend(data)
+        self.__pending_timestamps.extend(timestamps)
+        if len(self.__pending_data) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        datasets = self.datasets
+        if datasets is None or len(self.__pending_data) == 0:
+            return
+        for dataset, values in zip(datasets, self.pending):
+            n = dataset.shape[0]
+            dataset.resize((n + len(values),))
+            dataset[n:] = values
+        self.__pending_data = _GrowableArray(dtype=np.int8, capacity=self.chunk_size)
+        self.__pending_timestamps = _GrowableArray(dtype=np.float64, capacity=self.chunk_size)
+
+    def __del__(self):
+        if len(self.__pending_data) > 0 and self.datasets is not None:
+            warnings.warn(f"{len(self.__pending_data)} values appended to a PhotostimulationSeries after the file was "
+                          "written were not flushed and are lost; call 'flush' before closing the file.")
+
+
+class _StreamDataIO(H5DataIO):
+    """
+    Placeholder for an empty, resizable dataset of an _EventStream. Once the datasets of the stream are created,
+    i.e., when the file is written, the values buffered until then are written to them.
+    """
+
+    def __init__(self, stream, **kwargs):
+        super().__init__(**kwargs)
+        self.__stream = stream
+
+    @H5DataIO.dataset.setter
+    def dataset(self, val):
+        H5DataIO.dataset.fset(self, val)
+        self.__stream.flush()
+
+
+def _read_chunk_iterator(iterator):
+    """
+    Read the values of a 1D data chunk iterator into an array.
+    """
+    chunks = [(np.index_exp[chunk.selection][0], chunk.data) for chunk in iterator
+              if chunk is not None and chunk.data is not None]
+    values = np.empty(max([selection.stop for selection, _ in chunks], default=0), dtype=iterator.dtype)
+    for selection, data in chunks:
+        values[selection] = data
+    return values
+
+
 @register_class('SpatialLightModulator', namespace)
 class SpatialLightModulator(Device):
     """
@@ -146,11 +579,15 @@ class HolographicPattern(NWBContainer):
     __nwbfields__ = ('image_mask_roi', 'pixel_roi', 'stim_duration', 'roi_size', 'dimension',
                      {'name': 'method', 'child': True})
 
+    # masks derived from 'pixel_roi' or 'image_mask_roi', shared by all patterns and keyed on their content
+    mask_cache = _LRUCache()
+
     @docval(*get_docval(NWBContainer.__init__) + (
             {'name': 'image_mask_roi', 'type': 'array_data',
              'doc': ("ROIs designated using a mask of size [width, height] (2D stimulation) or [width, height, "
                      "depth] (3D stimulation), where for a given pixel a value of 1 indicates stimulation, "
-                     "and a value of 0 indicates no stimulation."),
+                     "and a value of 0 indicates no stimulation. The mask is stored as uint8, in chunked, "
+                     "gzip-compressed form unless it is already wrapped in an H5DataIO."),
              'default': None, 'shape': ([None] * 2, [None] * 3)},
             {'name': 'pixel_roi', 'type': 'array_data',
              'doc': ("ROIs designated as a list specifying the pixel ([x1, y1], [x2, y2], …) or voxel ([x1, y1, z1], "
@@ -200,99 +637,452 @@ class HolographicPattern(NWBContainer):
                 raise TypeError("'dimension' must be specified when using a pixel mask.")
 
         if args_to_set['image_mask_roi'] is not None:
-            mask_dim = args_to_set['image_mask_roi'].shape
+            args_to_set['image_mask_roi'] = self._compact_image_mask_roi(args_to_set['image_mask_roi'])
+            mask_dim = tuple(args_to_set['image_mask_roi'].shape)
 
             if args_to_set['dimension'] is None:
                 args_to_set['dimension'] = mask_dim
 
-#             if len(np.setdiff1d(np.unique(args_to_set['image_mask_roi']), np.array([0, 1]))) > 0:
-#                 if len(np.setdiff1d(np.unique(args_to_set['image_mask_roi']), np.array([0., 1.]))) > 0:
-#                     raise ValueError("'image_mask_roi' data must be either 0 (off) or 1 (on).")
-
         for key, val in args_to_set.items():
             setattr(self, key, val)
 
-    def show_mask(self):
+    def clear_mask_cache(self):
+        """
+        Remove the masks derived from this pattern from 'HolographicPattern.mask_cache'.
+        """
+        for key in getattr(self, '_HolographicPattern__mask_keys', ()):
+            self.mask_cache.pop(key)
+        self.__mask_keys = set()
+
+    def _mask_cache_key(self, *args):
+        """
+        Key identifying a derived mask by the content of the 'dimension', 'roi_size', and 'pixel_roi' (or
+        'image_mask_roi') fields, and by the arguments used to derive it. Masks stored in a file are identified by
+        this pattern instead, so that their derived masks are not shared with other patterns.
+        """
+        roi_size = None if self.roi_size is None else np.asarray(self.roi_size, dtype=float).tolist()
+        digest = hashlib.blake2b(repr((args, np.asarray(self.dimension).tolist(), roi_size)).encode(),
+                                 digest_size=16)
+
+        if self.pixel_roi is not None:
+            digest.update(np.ascontiguousarray(self.pixel_roi, dtype=float).tobytes())
+        else:
+            image_mask = self.image_mask
+            if isinstance(image_mask, h5py.Dataset):
+                # avoid reading masks stored in a file just to identify them; the file may be rewritten at the same
+                # path, so they are keyed on a token unique to this pattern rather than on their location
+                if getattr(self, '_HolographicPattern__file_mask_token', None) is None:
+                    self.__file_mask_token = uuid.uuid4().hex
+                digest.update(self.__file_mask_token.encode())
+            else:
+                digest.update(np.ascontiguousarray(image_mask).tobytes())
+
+        key = digest.hexdigest()
+        if getattr(self, '_HolographicPattern__mask_keys', None) is None:
+            self.__mask_keys = set()
+        self.__mask_keys.add(key)
+        return key
+
+    @property
+    def image_mask(self):
+        """
+        Dense mask of the pattern. For patterns specified with 'pixel_roi', the mask is rasterized on first access
+        and cached; otherwise, 'image_mask_roi' is returned without being read into memory.
+        """
+        if self.pixel_roi is not None:
+            return self.pixel_to_image_mask_roi()
+        if isinstance(self.image_mask_roi, DataIO):
+            return self.image_mask_roi.data
+        return self.image_mask_roi
+
+    @property
+    def pixel_mask(self):
+        """
+        Pixel mask of the pattern, as returned by 'image_to_pixel', computed on first access and cached.
+        """
+        key = self._mask_cache_key('pixel_mask')
+        pixel_mask = self.mask_cache.get(key)
+        if pixel_mask is None:
+            pixel_mask = self.image_to_pixel(self.image_mask)
+            pixel_mask.setflags(write=False)
+            self.mask_cache.put(key, pixel_mask)
+        return pixel_mask
+
+    @staticmethod
+    def _compact_image_mask_roi(image_mask_roi):
+        """
+        Validate an in-memory image_mask_roi, cast it to uint8, and wrap it for chunked, compressed storage. Masks that
+        are already wrapped in a DataIO, or read from a file, are returned unchanged.
+        """
+        if isinstance(image_mask_roi, DataIO) or not isinstance(image_mask_roi, (np.ndarray, list, tuple)):
+            return image_mask_roi
+
+        image_mask_roi = np.asarray(image_mask_roi)
+        if not np.all((image_mask_roi == 0) | (image_mask_roi == 1)):
+            raise ValueError("'image_mask_roi' data must be either 0 (off) or 1 (on).")
+
+        # a chunk holds up to a 512 x 512 tile of a single plane
+        chunks = tuple(min(n, 512) for n in image_mask_roi.shape[:2]) + (1,) * (image_mask_roi.ndim - 2)
+        return H5DataIO(data=image_mask_roi.astype(np.uint8), chunks=chunks, compression='gzip',
+                        compression_opts=4)
+
+    @docval({'name': 'plane', 'type': int,
+             'doc': ("For 3D patterns, index of the plane (along the depth axis) to display. If not specified, every "
+                     "plane is displayed in its own panel."), 'default': None})
+    def show_mask(self, **kwargs):
         """
         Display a plot with a 2D mask of the holographic pattern
-        (white regions denote ROIs, black regions the background).
+        (white regions denote ROIs, black regions the background). 3D patterns are displayed plane by plane.
         """
-        if len(self.dimension) == 3:
-            raise ValueError('Cannot display 3D masks')
+        import matplotlib.pyplot as plt
+
+        plane = getargs('plane', kwargs)
 
+        center_points = None
         if self.pixel_roi is not None:
-            center_points = [[roi[0], roi[1]] for roi in self.pixel_roi]
-            center_points = np.array(center_points)
-            image_mask_roi = self.pixel_to_image_mask_roi()
-            plt.imshow(image_mask_roi, 'gray', interpolation='none')
-            plt.scatter(center_points[:, 0], center_points[:, 1], color='red', s=10)
+            center_points = np.asarray(self.pixel_roi, dtype=float)
+        image_mask_roi = self.image_mask
+
+        if len(image_mask_roi.shape) == 2:
+            planes = [None]
+        elif plane is not None:
+            planes = [plane]
+        else:
+            planes = list(range(image_mask_roi.shape[2]))
+
+        n_cols = int(np.ceil(np.sqrt(len(planes))))
+        n_rows = int(np.ceil(len(planes) / n_cols))
+        fig, axes = plt.subplots(n_rows, n_cols, squeeze=False)
+        for ax in axes.flat:
+            ax.axis('off')
+
+        for ax, p in zip(axes.flat, planes):
+            points = center_points
+            if p is None:
+                ax.imshow(image_mask_roi, 'gray', interpolation='none')
+            else:
+                ax.imshow(image_mask_roi[:, :, p], 'gray', interpolation='none')
+                ax.set_title(f"plane {p}")
+                if points is not None:
+                    points = points[np.round(points[:, 2]) == p]
 
-        if self.image_mask_roi is not None:
-            image_mask_roi = self.image_mask_roi
-            plt.imshow(image_mask_roi, 'gray', interpolation='none')
+            if points is not None:
+                ax.scatter(points[:, 0], points[:, 1], color='red', s=10)
 
-        plt.axis('off')
         plt.show()
 
+    @staticmethod
+    def _mask_shape(dimensions):
+        """
+        Shape of the mask array for a pattern with dimensions [width, height] or [width, height, depth]: rows run
+        along the y axis and columns along the x axis, followed by the depth axis for 3D patterns.
+        """
+        return (int(dimensions[1]), int(dimensions[0])) + tuple(int(d) for d in dimensions[2:])
+
+    @staticmethod
+    def _nearest_plane(z):
+        """
+        Plane holding ROIs one plane deep centered at depth 'z', i.e., the nearest plane, with halves rounded up.
+        """
+        return np.floor(np.asarray(z, dtype=float) + 0.5)
+
     @staticmethod
     def _create_circular_mask(dimensions, center, diameter):
         """
-        Create a circular mask at coordinate.
+        Create a circular mask at coordinate. For 3D dimensions, the mask is a cylinder one plane deep, in the plane
+        nearest to the center.
         """
+        if len(dimensions) == 3:
+            Y, X, Z = np.ogrid[:dimensions[1], :dimensions[0], :dimensions[2]]
+            dist_from_center = np.sqrt((X - center[0]) ** 2 + (Y - center[1]) ** 2)
+            return (dist_from_center <= diameter / 2) & (Z == HolographicPattern._nearest_plane(center[2]))
+
         Y, X = np.ogrid[:dimensions[1], :dimensions[0]]
         dist_from_center = np.sqrt((X - center[0]) ** 2 + (Y - center[1]) ** 2)
 
         mask = dist_from_center <= diameter / 2
         return mask
 
-    ## TO-DO: fxn looks incomplete, is there a mask created if img_depth is not None? -PKL
     @staticmethod
     def _create_rectangular_mask(dimensions, center, roi_size, img_depth=None):
         """
-        Create a sqaure mask at coordinate.
+        Create a rectangular mask at coordinate, or a cuboid mask if 'img_depth' is specified or the dimensions are
+        3D. A two-element 'roi_size' gives a cuboid one plane deep, in the plane nearest to the center.
         """
+        if img_depth is None and len(dimensions) == 3:
+            img_depth = dimensions[2]
+
         if img_depth is None:
             Y, X = np.ogrid[:dimensions[1], :dimensions[0]]
             X_dist_from_center = (X - center[0])
             Y_dist_from_center = (Y - center[1])
             mask = (np.abs(X_dist_from_center) <= roi_size[0] / 2) & (np.abs(Y_dist_from_center) <= roi_size[1] / 2)
+        else:
+            Y, X, Z = np.ogrid[:dimensions[1], :dimensions[0], :img_depth]
+            if len(roi_size) == 3:
+                in_depth = np.abs(Z - center[2]) <= roi_size[2] / 2
+            else:
+                in_depth = Z == HolographicPattern._nearest_plane(center[2])
+            mask = (np.abs(X - center[0]) <= roi_size[0] / 2) & (np.abs(Y - center[1]) <= roi_size[1] / 2) & in_depth
         return mask
 
-    def pixel_to_image_mask_roi(self):
-        """
-        Convert a pixel_roi to an image_mask_roi. Returns a 2D array containing the mask, where ROIs are encoded with a value of 1.
+    @staticmethod
+    def _rasterize_rois(dimensions, centers, roi_size, max_block_size=2 ** 22):
         """
-        if len(self.dimension) == 3:
-            raise ValueError("Cannot convert 3D 'pixel_roi' to 'image_mask_roi'.")
-
-        mask = np.zeros(shape=self.dimension)
-        for roi in self.pixel_roi:
-
-            if not isinstance(self.roi_size, Iterable):
-                tmp_mask = self._create_circular_mask(self.dimension, roi, self.roi_size)
-            else:
-                tmp_mask = self._create_rectangular_mask(self.dimension, roi, self.roi_size)
-            mask[tmp_mask] = 1
+        Find the pixels (or voxels) covered by each ROI, evaluating every ROI only inside its bounding box. Returns
+        the index of the ROI covering each pixel and the coordinates of the pixel along the axes of '_mask_shape'.
 
+        A scalar 'roi_size' gives circles, or for 3D patterns cylinders one plane deep; an iterable 'roi_size' gives
+        rectangles, or for 3D patterns cuboids (a two-element 'roi_size' is a rectangle within a single plane). ROIs
+        one plane deep lie in the plane nearest to their center.
+        """
+        shape = HolographicPattern._mask_shape(dimensions)
+        n_dims = len(shape)
+        # reorder (x, y[, z]) centers to (row, column[, plane]) array axes
+        centers = np.asarray(centers, dtype=float).reshape(-1, n_dims)[:, [1, 0] + list(range(2, n_dims))]
+
+        circular = not isinstance(roi_size, Iterable)
+        if circular:
+            half_size = np.array([roi_size / 2, roi_size / 2, 0][:n_dims])
+        else:
+            roi_size = np.asarray(roi_size, dtype=float)
+            half_size = np.array([roi_size[1], roi_size[0], roi_size[2] if len(roi_size) == 3 else 0][:n_dims]) / 2
+        if n_dims == 3 and (circular or len(roi_size) == 2):
+            centers[:, 2] = HolographicPattern._nearest_plane(centers[:, 2])
+
+        # the same kernel of candidate offsets is shared by every ROI, anchored at the corner of its bounding box;
+        # candidates are evaluated separably along each axis and combined by broadcasting
+        kernel_shape = [int(np.ceil(2 * h)) + 2 for h in half_size]
+        corners = np.floor(centers - half_size).astype(np.int64)
+
+        roi_index, axis_indices = [], [[] for _ in range(n_dims)]
+        block = max(1, max_block_size // int(np.prod(kernel_shape)))
+        for start in range(0, len(centers), block):
+            axis_coords, axis_dist, covered = [], [], True
+            for axis in range(n_dims):
+                coords = corners[start:start + block, axis, None] + np.arange(kernel_shape[axis])
+                dist = coords - centers[start:start + block, axis, None]
+                ok = (coords >= 0) & (coords < shape[axis])
+                if not circular or axis == 2:
+                    ok &= np.abs(dist) <= half_size[axis]
+
+                # expand to broadcast against the other axes of the kernel
+                expand = [slice(None)] + [None] * n_dims
+                expand[axis + 1] = slice(None)
+                axis_coords.append(coords)
+                axis_dist.append(dist[tuple(expand)])
+                covered = covered & ok[tuple(expand)]
+
+            if circular:
+                dist_from_center = np.sqrt(axis_dist[1] ** 2 + axis_dist[0] ** 2)
+                covered = covered & (dist_from_center <= roi_size / 2)
+
+            idx, *kernel_index = np.nonzero(covered)
+            roi_index.append(idx + start)
+            for axis in range(n_dims):
+                axis_indices[axis].append(axis_coords[axis][idx, kernel_index[axis]])
+
+        if len(roi_index) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, (empty,) * n_dims
+        return np.concatenate(roi_index), tuple(np.concatenate(indices) for indices in axis_indices)
+
+    @docval({'name': 'output', 'type': str,
+             'doc': ("Format of the returned mask. 'dense' returns a 2D (or 3D) array where ROIs are encoded with a "
+                     "value of 1. 'label' returns an integer array of the same shape where each pixel holds the index "
+                     "(starting from 1) of the ROI in 'pixel_roi' covering it, and 0 for background; where ROIs "
+                     "overlap, the later ROI is kept. 'coords' returns a list with, for each ROI, an array of the "
+                     "coordinates of the pixels it covers. 'sparse' returns a scipy.sparse COO matrix of shape "
+                     "[num_rois, num_pixels], indexing pixels of the flattened mask."),
+             'enum': ['dense', 'label', 'coords', 'sparse'], 'default': 'dense'},
+            {'name': 'dtype', 'type': (type, np.dtype, str),
+             'doc': ("Data type of the mask when 'output' is 'dense'."), 'default': float})
+    def pixel_to_image_mask_roi(self, **kwargs):
+        """
+        Convert a pixel_roi to an image_mask_roi. By default, returns a 2D (or 3D) array containing the mask, where
+        ROIs are encoded with a value of 1. Results are cached in 'HolographicPattern.mask_cache' and returned as
+        read-only arrays.
+        """
+        output, dtype = getargs('output', 'dtype', kwargs)
+        if self.pixel_roi is None:
+            raise ValueError("'pixel_to_image_mask_roi' requires a pattern specified by 'pixel_roi'; use 'image_mask' "
+                             "for patterns specified by 'image_mask_roi'.")
+        key = self._mask_cache_key('pixel_to_image_mask_roi', output, np.dtype(dtype).str)
+        mask = self.mask_cache.get(key)
+        if mask is None:
+            mask = self._pixel_to_image_mask_roi(output, dtype)
+            for arr in (mask if output == 'coords' else [mask]):
+                if isinstance(arr, np.ndarray):
+                    arr.setflags(write=False)
+            self.mask_cache.put(key, mask)
+
+        if output == 'sparse':
+            return mask.copy()
         return mask
 
+    def _pixel_to_image_mask_roi(self, output, dtype):
+        """
+        Rasterize 'pixel_roi' into the format requested in 'pixel_to_image_mask_roi'.
+        """
+        shape = self._mask_shape(self.dimension)
+        roi_index, coords = self._rasterize_rois(self.dimension, self.pixel_roi, self.roi_size)
+        num_rois = len(self.pixel_roi)
+
+        if output == 'dense':
+            mask = np.zeros(shape=shape, dtype=dtype)
+            mask[coords] = 1
+            return mask
+
+        if output == 'label':
+            label = np.zeros(shape=shape, dtype=np.uint16 if num_rois < 2 ** 16 else np.uint32)
+            label[coords] = roi_index + 1
+            return label
+
+        if output == 'coords':
+            # pixels are grouped by ROI, in order
+            splits = np.searchsorted(roi_index, np.arange(1, num_rois))
+            return np.split(np.column_stack(coords), splits)
+
+        try:
+            from scipy.sparse import coo_matrix
+        except ImportError:
+            raise ImportError("scipy is required to convert 'pixel_roi' to a sparse mask.")
+
+        pixels = np.ravel_multi_index(coords, shape)
+        return coo_matrix((np.ones(len(pixels), dtype=np.uint8), (roi_index, pixels)),
+                          shape=(num_rois, int(np.prod(shape))))
+
     @staticmethod
-    def image_to_pixel(image_mask):
+    def image_to_pixel(image_mask, chunk_size=None):
         """
-        Converts an image_mask_roi into a pixel_mask_roi.
+        Converts an image_mask_roi into a pixel_mask_roi. Returns an array with one row per pixel (or voxel) with a
+        positive weight, formatted as [x, y, weight] for 2D masks or [x, y, z, weight] for 3D masks, where x, y and z
+        index the first, second and third axes of the mask.
+
+        The mask is converted 'chunk_size' indices along its first axis at a time, so that an image_mask_roi stored in
+        an HDF5 file is never loaded in full. By default, a chunked HDF5 dataset is converted one of its chunks at a
+        time, and other masks are converted in a single pass.
         """
+        if isinstance(image_mask, DataIO):
+            image_mask = image_mask.data
+
+        by_chunk = chunk_size is None and getattr(image_mask, 'chunks', None) is not None
+        if by_chunk:
+            selections = image_mask.iter_chunks()
+        else:
+            chunk_size = max(int(len(image_mask) if chunk_size is None else chunk_size), 1)
+            selections = (np.s_[start:start + chunk_size] for start in range(0, len(image_mask), chunk_size))
+
         pixel_mask = []
-        it = np.nditer(image_mask, flags=['multi_index'])
-        while not it.finished:
-            weight = it[0][()]
-            if weight > 0:
-                x = it.multi_index[0]
-                y = it.multi_index[1]
-                pixel_mask.append([x, y, 1])
-            it.iternext()
+        for selection in selections:
+            chunk = np.asarray(image_mask[selection])
+            coords = np.nonzero(chunk > 0)
+            starts = [s.start or 0 for s in np.index_exp[selection]]
+            starts += [0] * (len(coords) - len(starts))
+            pixel_mask.append(np.column_stack(tuple(c + start for c, start in zip(coords, starts)) + (chunk[coords],)))
+
+        if len(pixel_mask) == 0:
+            return np.zeros((0, len(getattr(image_mask, 'shape', (0, 0))) + 1))
+        pixel_mask = np.concatenate(pixel_mask)
+        if by_chunk:
+            # chunks tile the mask in blocks, so the pixels are put back in the order of the mask
+            pixel_mask = pixel_mask[np.lexsort(pixel_mask[:, -2::-1].T)]
         return pixel_mask
 
 
+class PatternRegistry:
+    """
+    Registry of distinct HolographicPattern and PhotostimulationMethod objects, identified by a hash of their content.
+    Interning a pattern returns the first registered pattern with the same masks, 'pixel_roi', 'roi_size',
+    'dimension', 'stim_duration' and method (including its SLM and laser), regardless of names. Series constructed with
+    a 'pattern_registry' share a single pattern per distinct content, which is written once and linked from every
+    other series.
+    """
+
+    # attributes identifying the content of each type, with the child containers hashed recursively
+    content_fields = {
+        HolographicPattern: ('image_mask_roi', 'pixel_roi', 'stim_duration', 'roi_size', 'dimension', 'method'),
+        PhotostimulationMethod: ('stimulus_method', 'sweep_pattern', 'sweep_size', 'time_per_sweep', 'num_sweeps',
+                                 'power_per_target', 'opsin', 'slm', 'laser'),
+        SpatialLightModulator: ('description', 'manufacturer', 'model', 'size'),
+        Laser: ('description', 'manufacturer', 'model', 'wavelength', 'power', 'peak_pulse_energy', 'pulse_rate'),
+    }
+
+    def __init__(self):
+        self.__patterns = {}
+        self.__methods = {}
+
+    def __len__(self):
+        return len(self.__patterns)
+
+    @property
+    def patterns(self):
+        """
+        The distinct patterns registered so far, in the order they were registered.
+        """
+        return list(self.__patterns.values())
+
+    @property
+    def methods(self):
+        """
+        The distinct methods registered so far, in the order they were registered.
+        """
+        return list(self.__methods.values())
+
+    @docval({'name': 'pattern', 'type': HolographicPattern, 'doc': ("HolographicPattern to intern.")})
+    def intern(self, **kwargs):
+        """
+        Return the registered pattern with the same content as 'pattern', registering 'pattern' if there is none.
+        The method of a newly registered pattern is registered as well.
+        """
+        pattern = getargs('pattern', kwargs)
+        pattern = self.__patterns.setdefault(self.content_key(pattern), pattern)
+        if pattern.method is not None:
+            self.__methods.setdefault(self.content_key(pattern.method), pattern.method)
+        return pattern
+
+    @docval({'name': 'method', 'type': PhotostimulationMethod, 'doc': ("PhotostimulationMethod to intern.")})
+    def intern_method(self, **kwargs):
+        """
+        Return the registered method with the same content as 'method', registering 'method' if there is none. Use
+        it when constructing patterns that differ only in their masks, so that they share a single method.
+        """
+        method = getargs('method', kwargs)
+        return self.__methods.setdefault(self.content_key(method), method)
+
+    @classmethod
+    def content_key(cls, container):
+        """
+        Return a hash of the content of a HolographicPattern, PhotostimulationMethod, SpatialLightModulator, or Laser.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        cls._update_digest(digest, container)
+        return digest.hexdigest()
+
+    @classmethod
+    def _update_digest(cls, digest, value):
+        if value is None or isinstance(value, str):
+            digest.update(repr(value).encode())
+            return
+
+        fields = next((f for t, f in cls.content_fields.items() if isinstance(value, t)), None)
+        if fields is not None:
+            digest.update(type(value).__name__.encode())
+            for key in fields:
+                digest.update(key.encode())
+                cls._update_digest(digest, getattr(value, key, None))
+            return
+
+        if isinstance(value, DataIO):
+            value = value.data
+        value = np.asarray(value[()] if isinstance(value, h5py.Dataset) else value)
+        # compare values rather than their representation, e.g., a pixel_roi given as integers or floats
+        if value.dtype.kind in 'biuf':
+            value = value.astype(np.float64)
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+
+
 @register_class('PhotostimulationSeries', namespace)
 class PhotostimulationSeries(TimeSeries):
     """
@@ -318,7 +1108,8 @@ class PhotostimulationSeries(TimeSeries):
                      "'timestamps[i]', for example, indicates the stimulus was presented at time 'timestamps[i]' for "
                      "'timestamps[i]'+'stim_duration' seconds. Alternatively, 'rate' can be specified instead of "
                      "'timestamps', when data are sampled uniformly. Either 'timestamps' or 'rate' must be specified "
-                     "when using the series format."), 'default': list()},
+                     "when using the series format. Data can also be read from a data chunk iterator, in which case "
+                     "each chunk is validated as it is written."), 'default': list()},
             {'name': 'timestamps', 'type': ('array_data', 'data', TimeSeries, Iterable),
              'doc': ("Timestamps corresponding to stimulus presentation values contained in 'data'."),
              'default': None, 'shape': (None,)},
@@ -331,96 +1122,158 @@ class PhotostimulationSeries(TimeSeries):
              'doc': ("Length of each epoch (in sec)."), 'default': None},
             {'name': 'pattern', 'type': (HolographicPattern),
              'doc': ("HolographicPattern associated with current photostim series.")},
+            {'name': 'pattern_registry', 'type': PatternRegistry,
+             'doc': ("If specified, use the pattern in the registry with the same content as 'pattern', so that "
+                     "identical patterns are stored once and linked from every series using them."),
+             'default': None},
             {'name': 'unit', 'type': str,
              'doc': ("Timestamps unit (default: seconds)."), 'default': 'seconds'},
+            {'name': 'appendable', 'type': bool,
+             'doc': ("If True, write 'data' and 'timestamps' to resizable datasets, so that presentations added after "
+                     "the file is written are appended to the file in chunks of 'chunk_size' rather than held in "
+                     "memory. Call 'flush' to write the remaining presentations before closing the file."),
+             'default': False},
+            {'name': 'validate', 'type': bool,
+             'doc': ("If False, skip checking the values of 'data' and 'timestamps', e.g., when loading data that is "
+                     "known to be valid. Values are not checked when the series is read from a file."),
+             'default': True},
+            {'name': 'chunk_size', 'type': int,
+             'doc': ("Number of presentations buffered before they are written to the file, and the chunk length of "
+                     "the datasets, for an appendable series."), 'default': 4096},
             *get_docval(TimeSeries.__init__, 'resolution', 'conversion', 'starting_time',
                         'comments', 'description', 'control', 'control_description', 'offset')
             )
     def __init__(self, **kwargs):
-        # convert 'data' to np array
-        if isinstance(kwargs['data'], np.ndarray):
-            kwargs['data'] = list(kwargs['data'])
-        # convert 'timestamps' to list
-        if isinstance(kwargs['timestamps'], (list, tuple)):
-            kwargs['timestamps'] = list(kwargs['timestamps'])
-
-        # if using interval format...
-        if kwargs['format'] == 'interval':
-            if len(kwargs['data']) == 0:
-                # kwargs['data'] = np.array([])
-
-                if kwargs['timestamps'] is not None:
-                    raise ValueError("'timestamps' can't be specified without corresponding 'data'.")
-                kwargs['timestamps'] = []
-                # kwargs['timestamps'] = np.array([])
-            # if intervals are input, check that formatted correctly
-            else:
-                # check that timestamps are also input
-                if kwargs['timestamps'] is None:
-                    raise ValueError("Need to specify corresponding 'timestamps' for each entry in 'data'.")
-
-                # check data and timestamps are same length
-                if len(kwargs['data']) != len(kwargs['timestamps']):
-                    raise ValueError("'data' and 'timestamps' need to be the same length.")
-
-                if len(np.setdiff1d(np.unique(kwargs['data']), np.array([-1, 1]))) > 0:
-                    if len(np.setdiff1d(np.unique(kwargs['data']), np.array([-1., 1.]))) > 0:
-                        raise ValueError("'interval' data must be either -1 (offset) or 1 (onset).")
-
-        # if using series format...
-        if kwargs['format'] == 'series':
-            if kwargs['stim_duration'] is None:
-                raise ValueError("If 'format' is 'series', 'stim_duration' must be specified.")
-
-            if len(kwargs['data']) == 0:
-                # kwargs['data'] = np.array([])
-
-                if kwargs['timestamps'] is not None:
-                    raise ValueError("'timestamps' can't be specified without corresponding 'data'.")
-
-                if kwargs['rate'] is None:
-                    kwargs['timestamps'] = []
-                # kwargs['timestamps'] = np.array([])
-            else:
-                if kwargs['timestamps'] is None and kwargs['rate'] is None:
-                    raise ValueError("Either 'timestamps' or 'rate' must be specified.")
-
-            if kwargs['timestamps'] is not None:
-                # check data and timestamps are same length
-                if len(kwargs['data']) != len(kwargs['timestamps']):
-                    raise ValueError("'data' and 'timestamps' need to be the same length.")
-
-                if len(np.setdiff1d(np.unique(kwargs['data']), np.array([0, 1]))) > 0:
-                    if len(np.setdiff1d(np.unique(kwargs['data']), np.array([0., 1.]))) > 0:
-                        raise ValueError("'series' data must be either 0 or 1.")
+        appendable, chunk_size, validate, pattern_registry = popargs('appendable', 'chunk_size', 'validate',
+                                                                     'pattern_registry', kwargs)
+        if pattern_registry is not None:
+            kwargs['pattern'] = pattern_registry.intern(kwargs['pattern'])
+
+        # store in-memory 'data' and 'timestamps' as typed, growable arrays
+        if isinstance(kwargs['data'], (list, tuple, np.ndarray)):
+            kwargs['data'] = np.asarray(kwargs['data'])
+        if isinstance(kwargs['timestamps'], (list, tuple, np.ndarray)):
+            kwargs['timestamps'] = np.asarray(kwargs['timestamps'], dtype=np.float64)
+        self._check_presentation_args(kwargs, appendable)
+
+        # check the values in a single pass, chunk by chunk as they are written for values read from an iterator; values
+        # read from a file are not checked, so that files written by earlier versions can still be read
+        if validate and not self._in_construct_mode:
+            kwargs['data'], kwargs['timestamps'] = _PresentationValidator(kwargs['format']).validate(
+                kwargs['data'], kwargs['timestamps'])
 
         keys_to_set = ('format', 'stim_duration', 'epoch_length', 'pattern')
         args_to_set = popargs_to_dict(keys_to_set, kwargs)
 
         data, timestamps = popargs('data', 'timestamps', kwargs)
+        if isinstance(data, np.ndarray):
+            data = _GrowableArray(data, dtype=np.int8)
+        if isinstance(timestamps, np.ndarray):
+            timestamps = _GrowableArray(timestamps, dtype=np.float64)
         self.__interval_data = data
         self.__interval_timestamps = timestamps
+        self.__presentation_bounds = None
+        self.__intervals = None
+        self.__interval_index = None
+        self.__stream = None
         kwargs['unit'] = 'seconds'
 
-        super().__init__(data=data, timestamps=timestamps, **kwargs)
+        super().__init__(data=self.data, timestamps=self.timestamps, **kwargs)
         for key, val in args_to_set.items():
             setattr(self, key, val)
 
+        if appendable:
+            self._create_stream(chunk_size)
+
+    @staticmethod
+    def _check_presentation_args(kwargs, appendable):
+        """
+        Check that 'data', 'timestamps', and 'rate' are consistent with each other and with 'format', and set
+        'timestamps' to an empty array for a series with no data.
+        """
+        iterated = [isinstance(kwargs[key], AbstractDataChunkIterator) for key in ('data', 'timestamps')]
+        if appendable:
+            if any(iterated):
+                raise ValueError("'data' and 'timestamps' of an appendable PhotostimulationSeries can't be iterators.")
+            if kwargs['rate'] is not None:
+                raise ValueError("An appendable PhotostimulationSeries requires 'timestamps' rather than 'rate'.")
+        if kwargs['format'] == 'series' and kwargs['stim_duration'] is None:
+            raise ValueError("If 'format' is 'series', 'stim_duration' must be specified.")
+
+        if not iterated[0] and len(kwargs['data']) == 0:
+            # empty 'timestamps' are written along with empty 'data', e.g., for an appendable series
+            timestamps = kwargs['timestamps']
+            if timestamps is not None and (iterated[1] or isinstance(timestamps, TimeSeries) or len(timestamps) > 0):
+                raise ValueError("'timestamps' can't be specified without corresponding 'data'.")
+            if timestamps is None and (kwargs['format'] == 'interval' or kwargs['rate'] is None):
+                kwargs['timestamps'] = np.array([], dtype=np.float64)
+            return
+
+        if kwargs['format'] == 'interval' and kwargs['timestamps'] is None:
+            raise ValueError("Need to specify corresponding 'timestamps' for each entry in 'data'.")
+        if kwargs['timestamps'] is None and kwargs['rate'] is None:
+            raise ValueError("Either 'timestamps' or 'rate' must be specified.")
+        if kwargs['timestamps'] is not None and not any(iterated) and len(kwargs['data']) != len(kwargs['timestamps']):
+            raise ValueError("'data' and 'timestamps' need to be the same length.")
+
+    def _create_stream(self, chunk_size):
+        """
+        Hold the presentations of an appendable series in a stream, which writes them to resizable datasets when the
+        file is written, and appends later presentations to them in chunks.
+        """
+        stream = _EventStream.create(chunk_size)
+        stream.extend(self.data, self.timestamps)
+        self.__stream = stream
+        self.__interval_data = self.__interval_timestamps = None
+        self.fields['data'] = self.__stream.data_io
+        self.fields['timestamps'] = self.__stream.timestamps_io
+
     @docval({'name': 'start', 'type': (int, float), 'doc': ("Start of the interval (in seconds).")},
             {'name': 'stop', 'type': (int, float), 'doc': ("End of the interval (in seconds).")})
     def add_interval(self, **kwargs):
         """
         Function to indicate stimulus was presented from time 'start' to time 'end.' Required format is
-        'interval'.
+        'interval'. Unlike 'add_intervals', the interval is not checked against the presentations already in the
+        series.
         """
         start, stop = getargs('start', 'stop', kwargs)
         if self.format == 'series':
             raise ValueError("Cannot add interval to PhotostimulationSeries with 'format' of 'series'.")
 
-        self.__interval_data.append(1)
-        self.__interval_data.append(-1)
-        self.__interval_timestamps.append(start)
-        self.__interval_timestamps.append(stop)
+        self._check_appendable()
+        bounds = self._presentation_bounds() or (start, stop)
+        self._append(np.array([1, -1], dtype=np.int8), np.array([start, stop], dtype=np.float64))
+        self.__presentation_bounds = (max(bounds[0], start), max(bounds[1], start, stop))
+
+    @docval({'name': 'starts', 'type': 'array_data', 'shape': (None,),
+             'doc': ("Start times of the intervals (in seconds), in increasing order.")},
+            {'name': 'stops', 'type': 'array_data', 'shape': (None,),
+             'doc': ("End times of the intervals (in seconds).")},
+            {'name': 'check_overlap', 'type': bool,
+             'doc': ("If True, raise an error if any interval overlaps another interval, including the intervals "
+                     "already in the series."), 'default': False})
+    def add_intervals(self, **kwargs):
+        """
+        Indicate the stimulus was presented from each time in 'starts' to the corresponding time in 'stops'. The
+        intervals are validated and appended together. Required format is 'interval'. For an appendable series that
+        has been written, call 'flush' before closing the file, or the intervals still buffered are lost.
+        """
+        starts, stops, check_overlap = getargs('starts', 'stops', 'check_overlap', kwargs)
+        if self.format == 'series':
+            raise ValueError("Cannot add interval to PhotostimulationSeries with 'format' of 'series'.")
+
+        starts = np.asarray(starts, dtype=np.float64).ravel()
+        stops = np.asarray(stops, dtype=np.float64).ravel()
+        if len(starts) != len(stops):
+            raise ValueError("'starts' and 'stops' must be the same length.")
+        if len(starts) == 0:
+            return
+        if not np.all(starts <= stops):
+            raise ValueError("Intervals cannot stop before they start.")
+
+        bounds = self._check_presentations(starts, stops, check_overlap)
+        self._append(np.tile(np.array([1, -1], dtype=np.int8), len(starts)), np.column_stack((starts, stops)).ravel())
+        self.__presentation_bounds = bounds
 
     @docval({'name': 'timestamp', 'type': (int, float, Iterable), 'doc': ("")})
     def add_onset(self, **kwargs):
@@ -429,26 +1282,296 @@ class PhotostimulationSeries(TimeSeries):
         'data' and 'time' to 'timestamps'. If format is 'interval', call 'add_interval' for the interval from 'time'
         to 'time+stim_duration'.
         """
-        if self.stim_duration is None:
-            raise ValueError("Cannot add presentation to PhotostimulationSeries without 'stim_duration'.")
-
         timestamps = getargs('timestamp', kwargs)
 
         if not isinstance(timestamps, Iterable):
             timestamps = [timestamps]
+        elif not isinstance(timestamps, (list, tuple, np.ndarray)):
+            timestamps = list(timestamps)
+
+        self.add_onsets(timestamps)
+
+    @docval({'name': 'timestamps', 'type': 'array_data', 'shape': (None,),
+             'doc': ("Onset times (in seconds) of the presentations, in increasing order.")},
+            {'name': 'check_overlap', 'type': bool,
+             'doc': ("If True, raise an error if any presentation overlaps another presentation, including the "
+                     "presentations already in the series."), 'default': False})
+    def add_onsets(self, **kwargs):
+        """
+        Denote stimulation at each time in 'timestamps'. If format is 'series', add 1 to 'data' and the onset to
+        'timestamps' for each presentation. If format is 'interval', add the intervals from each onset to
+        onset+stim_duration. The presentations are validated and appended together. For an appendable series that
+        has been written, call 'flush' before closing the file, or the presentations still buffered are lost.
+        """
+        timestamps, check_overlap = getargs('timestamps', 'check_overlap', kwargs)
+        if self.stim_duration is None:
+            raise ValueError("Cannot add presentation to PhotostimulationSeries without 'stim_duration'.")
+
+        onsets = np.asarray(timestamps, dtype=np.float64).ravel()
+        if self.format == 'interval':
+            self.add_intervals(onsets, onsets + self.stim_duration, check_overlap)
+            return
+
+        if len(onsets) == 0:
+            return
+        bounds = self._check_presentations(onsets, onsets + self.stim_duration, check_overlap)
+        self._append(np.ones(len(onsets), dtype=np.int8), onsets)
+        self.__presentation_bounds = bounds
+
+    def _presentation_bounds(self):
+        """
+        Latest onset and latest offset of the presentations in the series, or None if there are no presentations.
+        Computed from the data once, then maintained as presentations are added.
+        """
+        if self.__presentation_bounds is not None:
+            return self.__presentation_bounds or None
+
+        bounds = ()
+        if self.timestamps is not None and len(self.data) > 0:
+            data = np.asarray(self.data)
+            timestamps = np.asarray(self.timestamps, dtype=np.float64)
+            starts = timestamps[data == 1]
+            if len(starts) > 0:
+                if self.format == 'interval':
+                    stops = timestamps[data == -1]
+                    bounds = (starts.max(), max(starts.max(), stops.max() if len(stops) > 0 else -np.inf))
+                else:
+                    bounds = (starts.max(), starts.max() + self.stim_duration)
+
+        self.__presentation_bounds = bounds
+        return bounds or None
+
+    def _check_presentations(self, starts, stops, check_overlap):
+        """
+        Check that presentations from 'starts' to 'stops' are in order of increasing start time and follow those
+        already in the series, and optionally that none overlap. Returns the bounds of the series with the new
+        presentations added.
+        """
+        self._check_appendable()
+        bounds = self._presentation_bounds()
+
+        if np.any(starts[1:] < starts[:-1]):
+            raise ValueError("Presentations must be added in order of increasing start time.")
+        if bounds is not None and starts[0] < bounds[0]:
+            raise ValueError("Presentations cannot start before the last presentation in the series.")
+
+        if check_overlap:
+            previous_stops = np.maximum.accumulate(stops)[:-1]
+            if np.any(starts[1:] < previous_stops) or (bounds is not None and starts[0] < bounds[1]):
+                raise ValueError("Presentations cannot overlap.")
+
+        latest_stop = stops.max() if bounds is None else max(stops.max(), bounds[1])
+        return (starts[-1], latest_stop)
+
+    def _check_appendable(self):
+        """
+        Check that presentations can be added to the series.
+        """
+        if self.__interval_timestamps is None and self.__stream is None:
+            raise ValueError("Cannot add presentations to PhotostimulationSeries specified with 'rate'.")
+        if isinstance(self.__interval_data, AbstractDataChunkIterator):
+            raise ValueError("Cannot add presentations to PhotostimulationSeries with 'data' read from an iterator.")
+
+    def _append(self, data, timestamps):
+        """
+        Append values to 'data' and 'timestamps'. Values are appended to resizable datasets in a file opened for
+        writing through a stream; other data that are not held in memory are first copied into growable arrays.
+        """
+        if self.__stream is None and all(_EventStream.is_resizable(d)
+                                         for d in (self.__interval_data, self.__interval_timestamps)):
+            self.__stream = _EventStream(self.__interval_data, self.__interval_timestamps,
+                                         self.__interval_data.chunks[0])
+        self.__intervals = self.__interval_index = None
+        if self.__stream is not None:
+            self.__stream.extend(data, timestamps)
+            return
+
+        if not isinstance(self.__interval_data, _GrowableArray):
+            self.__interval_data = _GrowableArray(np.asarray(self.__interval_data), dtype=np.int8)
+        if not isinstance(self.__interval_timestamps, _GrowableArray):
+            self.__interval_timestamps = _GrowableArray(np.asarray(self.__interval_timestamps), dtype=np.float64)
+
+        self.__interval_data.extend(data)
+        self.__interval_timestamps.extend(timestamps)
+        # the object mapper writes the 'fields' values, so keep them pointing at the filled part of the buffers
+        self.fields['data'] = self.data
+        self.fields['timestamps'] = self.timestamps
+
+    def flush(self):
+        """
+        Write the presentations buffered by an appendable series to the file. Required before closing the file, or
+        the presentations added since the last flush are lost, which raises a warning when the series is garbage
+        collected. Has no effect before the file is written, which writes the presentations buffered until then.
+        """
+        if self.__stream is not None:
+            self.__stream.flush()
+
+    @docval({'name': 'times', 'type': ('array_data', int, float),
+             'doc': ("Time or times (in seconds) to look up, e.g., the timestamps of imaging frames.")},
+            returns="Whether the stimulus is on at each time, with the shape of 'times'.", rtype=(np.ndarray, bool))
+    def is_on(self, **kwargs):
+        """
+        Look up whether the stimulus is on at each of the given times, where each presentation is on from its onset
+        up to, but not including, its offset.
+        """
+        times = getargs('times', kwargs)
+        on = self._get_interval_index().is_on(times)
+        return bool(on) if on.ndim == 0 else on
+
+    @docval({'name': 't0', 'type': (int, float), 'doc': ("Start of the time window (in seconds).")},
+            {'name': 't1', 'type': (int, float), 'doc': ("End of the time window (in seconds).")},
+            returns="Array of shape (n, 2) with the start and stop times of the presentations, in order of start "
+                    "time.", rtype=np.ndarray)
+    def intervals_in(self, **kwargs):
+        """
+        Get the presentations that are on at any time in the window from 't0' up to, but not including, 't1'.
+        """
+        t0, t1 = getargs('t0', 't1', kwargs)
+        return self._get_interval_index().intervals_in(t0, t1)
+
+    @docval(returns="Array of shape (n, 2) with the start and stop times (in seconds) of each presentation.",
+            rtype=np.ndarray)
+    def get_intervals(self, **kwargs):
+        """
+        Get the start and stop times of the presentations in the series, in the order they are stored. For the
+        'series' format, each presentation stops 'stim_duration' after its onset. The result is computed on first use
+        and cached until presentations are added, and is read-only. Series with 'data' or 'timestamps' read from an
+        iterator can only be queried once written to a file and read back.
+        """
+        if self.__intervals is None:
+            values = [self.data, self.timestamps]
+            if any(isinstance(v.data if isinstance(v, DataIO) else v, AbstractDataChunkIterator) for v in values):
+                raise ValueError("Cannot query the presentations of PhotostimulationSeries with 'data' or 'timestamps' "
+                                 "read from an iterator; read the file back before querying the series.")
+            data = np.asarray(self.data)
+            if self.timestamps is None:
+                timestamps = (self.starting_time or 0.) + np.arange(len(data)) / self.rate
+            else:
+                timestamps = np.asarray(self.timestamps, dtype=np.float64)
 
-        for ts in timestamps:
+            starts = timestamps[data == 1]
             if self.format == 'interval':
-                self.add_interval(ts, ts + self.stim_duration)
+                stops = timestamps[data == -1]
+                if len(starts) != len(stops):
+                    raise ValueError("Number of starts does not equal number of stops.")
             else:
-                self.__interval_data.append(1)
-                self.__interval_timestamps.append(ts)
+                stops = starts + self.stim_duration
+            intervals = np.column_stack((starts, stops))
+            intervals.setflags(write=False)
+            self.__intervals = intervals
+        return self.__intervals
+
+    @docval({'name': 'rate', 'type': (int, float), 'doc': ("Sampling rate (in Hz) of a regular timeline."),
+             'default': None},
+            {'name': 'sample_times', 'type': 'array_data',
+             'doc': ("Times (in seconds) to sample the stimulus at, e.g., the timestamps of imaging frames."),
+             'default': None},
+            {'name': 'start', 'type': (int, float), 'doc': ("Time (in seconds) of the first sample, if using 'rate'."),
+             'default': 0.},
+            {'name': 'stop', 'type': (int, float),
+             'doc': ("Time (in seconds) to sample up to, if using 'rate'. Defaults to the end of the last "
+                     "presentation."), 'default': None},
+            returns="Boolean array with whether the stimulus is on at each sample.", rtype=np.ndarray)
+    def rasterize(self, **kwargs):
+        """
+        Sample the stimulus on a dense timeline, either at times 'start + k / rate' up to 'stop', or at the given
+        'sample_times'. Each presentation is on from its onset up to, but not including, its offset.
+        """
+        rate, sample_times, start, stop = getargs('rate', 'sample_times', 'start', 'stop', kwargs)
+        if (rate is None) == (sample_times is None):
+            raise ValueError("Specify either 'rate' or 'sample_times'.")
+
+        intervals = self.get_intervals()
+        if rate is not None:
+            if stop is None:
+                stop = intervals[:, 1].max() if len(intervals) > 0 else start
+            num_samples = int(self._first_sample(np.array([stop]), start, rate, np.iinfo(np.int64).max)[0])
+            first = self._first_sample(intervals[:, 0], start, rate, num_samples)
+            after = self._first_sample(intervals[:, 1], start, rate, num_samples)
+            order = None
+        else:
+            sample_times = np.asarray(sample_times, dtype=np.float64)
+            num_samples = len(sample_times)
+            order = None
+            if np.any(sample_times[1:] < sample_times[:-1]):
+                order = np.argsort(sample_times, kind='stable')
+                sample_times = sample_times[order]
+            first = np.searchsorted(sample_times, intervals[:, 0], side='left')
+            after = np.searchsorted(sample_times, intervals[:, 1], side='left')
+
+        # count the presentations each sample is in: +1 at the first sample of each, -1 after its last sample
+        counts = np.bincount(first, minlength=num_samples + 1) - np.bincount(after, minlength=num_samples + 1)
+        on = np.cumsum(counts[:num_samples]) > 0
+        if order is not None:
+            on[order] = on.copy()
+        return on
+
+    @staticmethod
+    def _first_sample(times, start, rate, num_samples):
+        """
+        Index of the first sample of the timeline 'start + k / rate' at or after each time, clipped to [0,
+        num_samples].
+        """
+        index = np.ceil((times - start) * rate)
+        # correct for rounding errors, comparing with the sample times themselves
+        index -= (start + (index - 1) / rate) >= times
+        index += (start + index / rate) < times
+        return np.clip(index, 0, num_samples).astype(np.int64)
+
+    @docval({'name': 'name', 'type': str, 'doc': ("Name of the new series. Defaults to the name of this series."),
+             'default': None},
+            returns="New PhotostimulationSeries with format 'interval'.", rtype='PhotostimulationSeries')
+    def to_interval_format(self, **kwargs):
+        """
+        Convert the series to the 'interval' format, with an onset and offset for each presentation.
+        """
+        name = getargs('name', kwargs)
+        intervals = self.get_intervals()
+        return PhotostimulationSeries(name=name or self.name, format='interval',
+                                      data=np.tile(np.array([1, -1], dtype=np.int8), len(intervals)),
+                                      timestamps=intervals.ravel(), stim_duration=self.stim_duration,
+                                      **self._conversion_kwargs())
+
+    @docval({'name': 'rate', 'type': (int, float), 'doc': ("Sampling rate (in Hz) of the new series.")},
+            {'name': 'start', 'type': (int, float), 'doc': ("Time (in seconds) of the first sample."), 'default': 0.},
+            {'name': 'name', 'type': str, 'doc': ("Name of the new series. Defaults to the name of this series."),
+             'default': None},
+            returns="New PhotostimulationSeries with format 'series'.", rtype='PhotostimulationSeries')
+    def to_series_format(self, **kwargs):
+        """
+        Convert the series to the 'series' format, sampled at 'rate' from 'start' to the end of the last
+        presentation. Each sample is 1 if the stimulus is on at its time (see 'rasterize'), with 'stim_duration' set
+        to the sampling interval.
+        """
+        rate, start, name = getargs('rate', 'start', 'name', kwargs)
+        data = self.rasterize(rate=rate, start=start).astype(np.int8)
+        return PhotostimulationSeries(name=name or self.name, format='series', data=data, rate=float(rate),
+                                      starting_time=float(start), stim_duration=1. / rate,
+                                      **self._conversion_kwargs())
+
+    def _conversion_kwargs(self):
+        """
+        Arguments shared by a series and the series it is converted to.
+        """
+        return dict(pattern=self.pattern, epoch_length=self.epoch_length, description=self.description,
+                    comments=self.comments, validate=False)
+
+    def _get_interval_index(self):
+        """
+        Index of the presentation intervals, built on first use and rebuilt after presentations are added.
+        """
+        if self.__interval_index is None:
+            intervals = self.get_intervals()
+            self.__interval_index = _IntervalIndex(intervals[:, 0], intervals[:, 1])
+        return self.__interval_index
 
     def to_dataframe(self):
         """
         Display 'data' and 'timestamps' side by side as a pandas dataframe. If 'timestamps' is not specified, calculate
         it using 'rate'.
         """
+        import pandas as pd
+
         data = np.array(self.data)
         ts = np.array(self.timestamps)
 
@@ -467,25 +1590,7 @@ class PhotostimulationSeries(TimeSeries):
         """
         Get list of tuples with format (start_time, stop_time) for the onset/offset of stimulus over timeseries.
         """
-        df = self.to_dataframe()
-
-        start_stop = []
-        if self.format == 'interval':
-            start_times = list(df[df['data'] == 1]['timestamps'])
-            end_times = list(df[df['data'] == -1]['timestamps'])
-
-            if len(start_times) != len(end_times):
-                raise ValueError("Number of starts does not equal number of stops.")
-
-            for start, end in zip(start_times, end_times):
-                start_stop.append((start, end))
-
-        if self.format == 'series':
-            start_times = list(df[df['data'] == 1]['timestamps'])
-
-            for start in start_times:
-                start_stop.append((start, start + self.stim_duration))
-        return start_stop
+        return [tuple(interval) for interval in self.get_intervals().tolist()]
 
     def _get_start_time(self):
         """
@@ -518,12 +1623,49 @@ class PhotostimulationSeries(TimeSeries):
 
     @property
     def data(self):
+        if self.__stream is not None:
+            return self._stream_values(0)
+        if isinstance(self.__interval_data, _GrowableArray):
+            return self.__interval_data.view
         return self.__interval_data
 
     @property
     def timestamps(self):
+        if self.__stream is not None:
+            return self._stream_values(1)
+        if isinstance(self.__interval_timestamps, _GrowableArray):
+            return self.__interval_timestamps.view
         return self.__interval_timestamps
 
+    def _stream_values(self, index):
+        """
+        Values of 'data' (index 0) or 'timestamps' (index 1) of an appendable series: the buffered values before the
+        file is written, and the written dataset afterwards. Values buffered since the last flush are returned
+        after those read from the dataset, without writing them.
+        """
+        datasets = self.__stream.datasets
+        pending = self.__stream.pending[index]
+        if datasets is None:
+            return pending
+        if len(pending) == 0:
+            return datasets[index]
+        return np.concatenate((datasets[index][:], pending))
+
+    def _read_iterators(self):
+        """
+        Read 'data' and 'timestamps' given as data chunk iterators into memory, validating them as they are read, so
+        that the series can be summarized, e.g., when it is added to a PhotostimulationTable. The values are then
+        written from memory.
+        """
+        if isinstance(self.__interval_data, AbstractDataChunkIterator):
+            self.__interval_data = _GrowableArray(_read_chunk_iterator(self.__interval_data), dtype=np.int8)
+            self.fields['data'] = self.data
+        if isinstance(self.__interval_timestamps, AbstractDataChunkIterator):
+            self.__interval_timestamps = _GrowableArray(_read_chunk_iterator(self.__interval_timestamps),
+                                                        dtype=np.float64)
+            self.fields['timestamps'] = self.timestamps
+        self.__presentation_bounds = self.__intervals = self.__interval_index = None
+
 
 @register_class('PhotostimulationTable', namespace)
 class PhotostimulationTable(DynamicTable):
@@ -550,8 +1692,21 @@ class PhotostimulationTable(DynamicTable):
          'required': True},
          {'name': 'method_name', 'description': ("Name of the PhotostimulationMethod associated with the series."),
           'required': True},
+        {'name': 'num_presentations', 'description': ("Number of presentations in the series."), 'required': False},
+        {'name': 'total_on_time', 'description': ("Summed duration (in seconds) of the presentations in the series."),
+         'required': False},
+        {'name': 'duty_cycle', 'description': ("Fraction of the time from the first onset to the last offset that the "
+                                               "stimulus is on."), 'required': False},
+        {'name': 'min_isi', 'description': ("Minimum time (in seconds) between consecutive onsets."),
+         'required': False},
+        {'name': 'mean_isi', 'description': ("Mean time (in seconds) between consecutive onsets."), 'required': False},
+        {'name': 'first_onset', 'description': ("Time (in seconds) of the first onset."), 'required': False},
+        {'name': 'last_offset', 'description': ("Time (in seconds) of the last offset."), 'required': False},
     )
 
+    summary_columns = ('num_presentations', 'total_on_time', 'duty_cycle', 'min_isi', 'mean_isi', 'first_onset',
+                       'last_offset')
+
     @docval(*get_docval(DynamicTable.__init__, 'name', 'description'),
             *get_docval(DynamicTable.__init__, 'id', 'columns', 'colnames'))
     def __init__(self, **kwargs):
@@ -561,6 +1716,7 @@ class PhotostimulationTable(DynamicTable):
         super().__init__(**kwargs)
         for key, val in args_to_set.items():
             setattr(self, key, val)
+        self.__interval_index = None
 
     @docval({'name': 'series', 'type': (PhotostimulationSeries, Iterable),
              'doc': ("Single 'PhotostimulationSeries', or list of 'PhotostimulationSeries', to add to the table.")},
@@ -573,7 +1729,8 @@ class PhotostimulationTable(DynamicTable):
 
     def add_series(self, **kwargs):
         """
-        Add PhotostimulationSeries, or list of PhotostimulationSeries, to PhotostimulationTable.
+        Add PhotostimulationSeries, or list of PhotostimulationSeries, to PhotostimulationTable. The 'data' and
+        'timestamps' of series read from data chunk iterators are read into memory to summarize the series.
         """
         series_list = kwargs['series']
         if not isinstance(series_list, Iterable):
@@ -592,51 +1749,879 @@ class PhotostimulationTable(DynamicTable):
             if len(row_names_list) != len(series_list):
                 raise ValueError("'series' and 'row_name' must be the same length.")
 
-        for series, name in zip(series_list, row_names_list):
+        series_list = list(series_list)
+        for series in series_list:
+            series._read_iterators()
             if len(series.data) == 0:
                 raise ValueError(f"Series {series.name} has no data. Cannot add to PhotostimulationTable.")
 
-            new_args = {'row_name': name,
-                        'series': series,
-                        'series_name': series.name,
-                        'series_format': series.format,
-                        'num_samples': series.num_samples,
-                        'start_time': float(series._get_start_time()),
-                        'stop_time': float(series._get_end_time()),
-                        'pattern_name': series.pattern.name,
-                        'method_name': series.pattern.method.name
-                        }
+        patterns = [series.pattern for series in series_list]
+        columns = {'row_name': list(row_names_list),
+                   'series': series_list,
+                   'series_name': [series.name for series in series_list],
+                   'series_format': [series.format for series in series_list],
+                   'num_samples': [series.num_samples for series in series_list],
+                   'start_time': [float(series._get_start_time()) for series in series_list],
+                   'stop_time': [float(series._get_end_time()) for series in series_list],
+                   'pattern_name': [pattern.name for pattern in patterns],
+                   'method_name': [pattern.method.name for pattern in patterns]}
+
+        # keep persisted summary columns filled in for the new rows
+        persisted = [name for name in self.summary_columns if name in self.colnames]
+        if persisted:
+            summary = self._summarize_series(series_list)
+            columns.update({name: summary[name].tolist() for name in persisted})
+        self._extend_rows(columns)
+
+    @docval({'name': 'persist', 'type': bool,
+             'doc': ("If True, also store the summary in the optional columns of the same names, which are then kept "
+                     "up to date as series are added."), 'default': False},
+            returns=("Dict of arrays with one value per row: 'num_presentations', 'total_on_time', 'duty_cycle', "
+                     "'min_isi', 'mean_isi', 'first_onset', and 'last_offset'. Values that are undefined for a row, "
+                     "e.g., the inter-stimulus interval of a series with a single presentation, are NaN."),
+            rtype=dict)
+    def summarize(self, **kwargs):
+        """
+        Summarize the presentations of the series in each row, computed for all rows at once.
+        """
+        persist = getargs('persist', kwargs)
+        summary = self._summarize_series(self.series[:])
+        if persist:
+            for name in self.summary_columns:
+                values = summary[name]
+                if name not in self.colnames:
+                    description = next(col['description'] for col in self.__columns__ if col['name'] == name)
+                    self.add_column(name=name, description=description, data=values.tolist())
+                elif isinstance(self[name].data, list):
+                    self[name].data[:] = values.tolist()
+                else:
+                    self[name].data[:] = values
+        return summary
+
+    @classmethod
+    def _summarize_series(cls, series_list):
+        """
+        Summary statistics of the presentations of each series, computed with segment reductions over the
+        concatenated intervals of all series.
+        """
+        intervals = [series.get_intervals() for series in series_list]
+        counts = np.array([len(i) for i in intervals], dtype=np.int64)
+        intervals = np.concatenate(intervals) if len(intervals) > 0 else np.empty((0, 2))
+        starts, stops = intervals[:, 0], intervals[:, 1]
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+
+        summary = {name: np.full(len(counts), np.nan) for name in cls.summary_columns}
+        summary['num_presentations'] = counts
+        nonempty = counts > 0
+        if np.any(nonempty):
+            segments = offsets[nonempty]
+            total = np.add.reduceat(stops - starts, segments)
+            first_onset = np.minimum.reduceat(starts, segments)
+            last_offset = np.maximum.reduceat(stops, segments)
+            summary['total_on_time'][nonempty] = total
+            summary['first_onset'][nonempty] = first_onset
+            summary['last_offset'][nonempty] = last_offset
+            with np.errstate(divide='ignore', invalid='ignore'):
+                summary['duty_cycle'][nonempty] = total / (last_offset - first_onset)
+        summary['total_on_time'][~nonempty] = 0.
+
+        # intervals between consecutive onsets, excluding those between the last onset of a series and the next series
+        multiple = counts > 1
+        if np.any(multiple):
+            isi = np.append(np.diff(starts), np.nan)
+            isi[(offsets + counts - 1)[nonempty]] = np.nan
+            segments = offsets[multiple]
+            summary['min_isi'][multiple] = np.fmin.reduceat(isi, segments)
+            summary['mean_isi'][multiple] = np.add.reduceat(np.nan_to_num(isi), segments) / (counts[multiple] - 1)
+        return summary
+
+    def _extend_rows(self, columns):
+        """
+        Add rows to the table, extending each column with its values at once, and giving the rows consecutive ids.
+        Equivalent to calling 'add_row' for each row.
+        """
+        if set(columns) != set(self.colnames):
+            raise ValueError(f"Values must be given for the columns {sorted(self.colnames)}, but were given for "
+                             f"{sorted(columns)}.")
+        _extend_columns(self, columns)
+        self.__interval_index = None
+
+    @docval({'name': 'times', 'type': ('array_data', int, float), 'doc': ("Time or times (in seconds) to look up.")},
+            returns=("Sorted array of the indices of the rows whose series is on at the time, or a list with such an "
+                     "array for each time."), rtype=(np.ndarray, list))
+    def active_at(self, **kwargs):
+        """
+        Find the rows whose series is on at each of the given times, where each presentation is on from its onset
+        up to, but not including, its offset.
+        """
+        times = np.asarray(getargs('times', kwargs), dtype=np.float64)
+        rows = self._get_interval_index().query(times.ravel(), times.ravel(), 'right')
+        return rows[0] if times.ndim == 0 else rows
+
+    @docval({'name': 't0', 'type': ('array_data', int, float), 'doc': ("Start of the window or windows (in seconds).")},
+            {'name': 't1', 'type': ('array_data', int, float), 'doc': ("End of the window or windows (in seconds).")},
+            returns=("Sorted array of the indices of the rows whose series is on at any time in the window, or a list "
+                     "with such an array for each window."), rtype=(np.ndarray, list))
+    def overlapping(self, **kwargs):
+        """
+        Find the rows whose series is on at any time in the window from 't0' up to, but not including, 't1', for a
+        single window or for arrays of windows.
+        """
+        t0, t1 = (np.asarray(t, dtype=np.float64) for t in getargs('t0', 't1', kwargs))
+        if t0.shape != t1.shape:
+            raise ValueError("'t0' and 't1' must have the same shape.")
+        rows = self._get_interval_index().query(t0.ravel(), t1.ravel(), 'left')
+        return rows[0] if t0.ndim == 0 else rows
+
+    def _get_intervals(self):
+        """
+        Start and stop times of the presentations of all series in the table, as an array of shape (n, 2), and the
+        row of each presentation.
+        """
+        intervals = [series.get_intervals() for series in self.series[:]]
+        rows = np.repeat(np.arange(len(intervals)), [len(i) for i in intervals])
+        intervals = np.concatenate(intervals) if len(intervals) > 0 else np.empty((0, 2))
+        return intervals, rows
+
+    def _get_interval_index(self):
+        """
+        Index of the presentation intervals of all series in the table, built on first use and rebuilt after rows
+        are added. Presentations added to a series after it was added to the table are not included until then.
+        """
+        if self.__interval_index is None:
+            intervals, rows = self._get_intervals()
+            self.__interval_index = _BucketedIntervalIndex(intervals[:, 0], intervals[:, 1], rows)
+        return self.__interval_index
+
+    @docval({'name': 'timestamps_or_series', 'type': ('array_data', TimeSeries),
+             'doc': ("Timestamps (in seconds) of the imaging frames, or the imaging TimeSeries itself, e.g., a "
+                     "TwoPhotonSeries or RoiResponseSeries.")},
+            {'name': 'chunk_size', 'type': int,
+             'doc': ("Number of timestamps read at a time, so that timestamps stored in a file are not loaded all at "
+                     "once."), 'default': 2 ** 16},
+            returns=("Dict of arrays with one entry per presentation: the table row of its series ('row'), its "
+                     "'onset_time' and 'offset_time', the index of the frame at or before its onset and offset "
+                     "('onset_frame', 'offset_frame'), and the fraction of the frame interval from that frame to the "
+                     "onset and offset ('onset_fraction', 'offset_fraction')."), rtype=dict)
+    def align_to(self, **kwargs):
+        """
+        Align the presentations of every series in the table to the frames of an imaging series. Frame positions
+        are interpolated between consecutive timestamps, and extrapolated from the first or last two frames for
+        presentations outside of the imaging series.
+        """
+        timestamps, chunk_size = getargs('timestamps_or_series', 'chunk_size', kwargs)
+
+        intervals, rows = self._get_intervals()
+        times = intervals.T.ravel()
+
+        if isinstance(timestamps, TimeSeries) and timestamps.timestamps is None:
+            positions = (times - (timestamps.starting_time or 0.)) * timestamps.rate
+            frames = np.clip(np.floor(positions), 0, max(len(timestamps.data) - 2, 0)).astype(np.int64)
+            fractions = positions - frames
+        else:
+            if isinstance(timestamps, TimeSeries):
+                timestamps = timestamps.timestamps
+            frames, fractions = self._locate_frames(timestamps, times, chunk_size)
+
+        n = len(rows)
+        return {'row': rows, 'onset_time': intervals[:, 0], 'offset_time': intervals[:, 1],
+                'onset_frame': frames[:n], 'onset_fraction': fractions[:n],
+                'offset_frame': frames[n:], 'offset_fraction': fractions[n:]}
+
+    @docval({'name': 'response', 'type': TimeSeries,
+             'doc': ("Response series to extract windows from, e.g., a RoiResponseSeries, with data of shape "
+                     "(num_samples,) or (num_samples, num_cells).")},
+            {'name': 'pre', 'type': int, 'doc': ("Number of samples in each window before the onset sample.")},
+            {'name': 'post', 'type': int,
+             'doc': ("Number of samples in each window from the onset sample on, including the onset sample.")},
+            {'name': 'out', 'type': (np.ndarray, str),
+             'doc': ("Preallocated array of shape (num_presentations, num_cells, pre + post) to write the windows to, "
+                     "or the path of a .npy file to create as a memory-mapped array. By default, a new array is "
+                     "allocated."), 'default': None},
+            {'name': 'num_threads', 'type': int, 'doc': ("Number of threads to read and copy the data with."),
+             'default': 1},
+            {'name': 'max_block_size', 'type': int,
+             'doc': ("Maximum size (in bytes) of a block of data read at once. Windows larger than this are read "
+                     "one at a time."), 'default': 2 ** 27},
+            returns=("Dict with the 'windows', of shape (num_presentations, num_cells, pre + post), and for each "
+                     "presentation the table row of its series ('row'), its 'onset_time', and the index of the "
+                     "response sample nearest to the onset ('onset_sample'). Samples outside of the response data "
+                     "are NaN."), rtype=dict)
+    def extract_windows(self, **kwargs):
+        """
+        Extract a window of the response around the onset of every presentation in the table. Windows are sorted and
+        merged into blocks of contiguous samples, so that each block is read from the file with a single read and
+        memory use is bounded by 'max_block_size' rather than the size of the response data.
+        """
+        response, pre, post, out, num_threads, max_block_size = getargs(
+            'response', 'pre', 'post', 'out', 'num_threads', 'max_block_size', kwargs)
+
+        alignment = self.align_to(response)
+        onsets = np.rint(alignment['onset_frame'] + alignment['onset_fraction']).astype(np.int64)
+
+        data = response.data.data if isinstance(response.data, DataIO) else response.data
+        num_samples = len(data)
+        num_cells = int(np.prod(data.shape[1:]))
+        length = pre + post
+        dtype = np.result_type(data.dtype, np.float32)
+        shape = (len(onsets), num_cells, length)
+        if out is None:
+            out = np.empty(shape, dtype=dtype)
+        elif isinstance(out, str):
+            out = np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=shape)
+        elif out.shape != shape:
+            raise ValueError(f"'out' must have shape {shape}.")
+
+        max_block_samples = max_block_size // (num_cells * dtype.itemsize)
+        blocks = self._plan_window_reads(onsets - pre, length, max_block_samples)
+
+        def read_block(block):
+            start, stop, events = block
+            values = np.full((stop - start, num_cells), np.nan, dtype=dtype)
+            lo, hi = max(start, 0), min(stop, num_samples)
+            if lo < hi:
+                values[lo - start:hi - start] = np.asarray(data[lo:hi]).reshape(hi - lo, num_cells)
+            samples = (onsets[events] - pre - start)[:, np.newaxis] + np.arange(length)
+            out[events] = values[samples].transpose(0, 2, 1)
+
+        if num_threads > 1:
+            with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                list(executor.map(read_block, blocks))
+        else:
+            for block in blocks:
+                read_block(block)
+
+        return {'windows': out, 'row': alignment['row'], 'onset_time': alignment['onset_time'],
+                'onset_sample': onsets}
+
+    @staticmethod
+    def _plan_window_reads(starts, length, max_block_samples):
+        """
+        Group windows of 'length' samples starting at 'starts' into blocks of contiguous samples, merging windows
+        that overlap or touch as long as the block stays within 'max_block_samples'. Returns a list of (start, stop,
+        window indices) for each block.
+        """
+        order = np.argsort(starts, kind='stable')
+        blocks = []
+        block_start = block_stop = None
+        first = 0
+        for i, window in enumerate(order):
+            start = starts[window]
+            if block_start is None or start > block_stop or start + length - block_start > max_block_samples:
+                if block_start is not None:
+                    blocks.append((block_start, block_stop, order[first:i]))
+                block_start, first = start, i
+            block_stop = start + length
+        if block_start is not None:
+            blocks.append((block_start, block_stop, order[first:]))
+        return blocks
 
-            super().add_row(**new_args)
+    @staticmethod
+    def _locate_frames(timestamps, times, chunk_size):
+        """
+        Index of the frame at or before each time, clipped so that a next frame exists, and the fraction of the
+        interval to the next frame at which the time falls. Timestamps are read in chunks, each overlapping the next by
+        one timestamp, and only chunks that contain times are read.
+        """
+        num_frames = len(timestamps)
+        if num_frames < 2:
+            raise ValueError("Need at least two frame timestamps to align to.")
+
+        chunk_starts = np.arange(0, num_frames - 1, chunk_size)
+        chunk_bounds = np.asarray(timestamps[0:num_frames - 1:chunk_size], dtype=np.float64)
+        chunks = np.clip(np.searchsorted(chunk_bounds, times, side='right') - 1, 0, len(chunk_starts) - 1)
+
+        frames = np.empty(len(times), dtype=np.int64)
+        fractions = np.empty(len(times), dtype=np.float64)
+        order = np.argsort(chunks, kind='stable')
+        chunk_ids, first = np.unique(chunks[order], return_index=True)
+        for chunk, selected in zip(chunk_ids, np.split(order, first[1:])):
+            start = chunk_starts[chunk]
+            frame_times = np.asarray(timestamps[start:start + chunk_size + 1], dtype=np.float64)
+            local = np.clip(np.searchsorted(frame_times, times[selected], side='right') - 1, 0, len(frame_times) - 2)
+            frames[selected] = start + local
+            fractions[selected] = ((times[selected] - frame_times[local])
+                                   / (frame_times[local + 1] - frame_times[local]))
+        return frames, fractions
 
     @docval({'name': 'figsize', 'type': Iterable, 'doc': ("Width, height in inches (float, float)"), 'default': None},
             {'name': 'xlim', 'type': Iterable, 'doc': ("Set x limits of plot with format [left, right]"), 'default': None})
     def plot_presentation_times(self, figsize=None, xlim=None):
         """
         Show a plot with each photostimulation series (y-axis), and the timestamp(s) at
-        which that pattern was presented (x-axis).
+        which that pattern was presented (x-axis). All presentations are drawn as a single collection of rectangles.
+        Presentations outside of 'xlim' are left out, and presentations in the same row that are closer together
+        than a pixel are drawn as one, at least a pixel wide.
         """
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import PolyCollection
 
         if figsize is None:
             fig, ax = plt.subplots()
         else:
             fig, ax = plt.subplots(figsize=figsize)
 
-        y_ticks = []
-        y_labels = []
-        for i in range(len(self.series)):
-            series = self.series[i]
-            start_stop_list = series._get_start_stop_list()
-            start_span_list = [(start, stop-start) for (start,stop) in start_stop_list]
-            ax.broken_barh(start_span_list, ((i + 1) * 10, 8))
-            y_ticks.append((i + 1) * 10 + 4)
-            y_labels.append(self.series_name[i])
-
-        ax.set_yticks(y_ticks, labels=y_labels)
+        intervals, rows = self._get_intervals()
+        if xlim is None:
+            xlim = (intervals[:, 0].min(), intervals[:, 1].max()) if len(intervals) > 0 else (0., 1.)
+        else:
+            visible = (intervals[:, 1] > xlim[0]) & (intervals[:, 0] < xlim[1])
+            intervals, rows = np.clip(intervals[visible], xlim[0], xlim[1]), rows[visible]
+        pixel = (xlim[1] - xlim[0]) / max(ax.get_window_extent().width, 1)
+        starts, stops, rows = self._merge_intervals(intervals, rows, pixel)
+
+        bottoms = (rows + 1) * 10.
+        vertices = np.stack((np.column_stack((starts, bottoms)), np.column_stack((starts, bottoms + 8)),
+                             np.column_stack((stops, bottoms + 8)), np.column_stack((stops, bottoms))), axis=1)
+        ax.add_collection(PolyCollection(vertices, facecolors='C0', linewidths=0))
+
+        num_rows = len(self)
+        ax.set_yticks((np.arange(num_rows) + 1) * 10 + 4, labels=list(self.series_name[:]))
+        ax.set_ylim(5, (num_rows + 1) * 10 + 3)
         ax.set_xlabel('Timestamp (seconds)')
         ax.set_title(f"Presentation timestamps for PhotostimulationTable '{self.name}'")
         ax.xaxis.grid()
-
-        if xlim is not None:
-            ax.set_xlim(xlim)
+        ax.set_xlim(xlim)
         return ax
+
+    @staticmethod
+    def _merge_intervals(intervals, rows, min_gap):
+        """
+        Merge intervals in the same row that overlap or are less than 'min_gap' apart, and widen the merged intervals
+        to at least 'min_gap'. Returns the starts, stops, and rows of the merged intervals.
+        """
+        order = np.lexsort((intervals[:, 0], rows))
+        starts, stops, rows = intervals[order, 0], intervals[order, 1], rows[order]
+        if len(starts) == 0:
+            return starts, stops, rows
+
+        # running maximum of the stop times within each row, by offsetting each row past the previous one
+        offset = (stops.max() - starts.min() + 2 * min_gap + 1) * rows
+        latest_stops = np.maximum.accumulate(stops + offset) - offset
+        new_run = np.ones(len(starts), dtype=bool)
+        new_run[1:] = (rows[1:] != rows[:-1]) | (starts[1:] > latest_stops[:-1] + min_gap)
+        first = np.flatnonzero(new_run)
+        starts, stops, rows = starts[first], np.maximum.reduceat(stops, first), rows[first]
+        return starts, np.maximum(stops, starts + min_gap), rows
+
+
+@register_class('HolographicPatternTable', namespace)
+class HolographicPatternTable(DynamicTable):
+    """
+    Table of holographic patterns, with one row per pattern, and all patterns sharing a single PhotostimulationMethod,
+    up to its 'power_per_target'. Patterns specified by 'pixel_roi' are stored as the centers, size and weights of
+    their targets, and other patterns as the list of pixels (or voxels) of their mask, in ragged columns shared by all
+    patterns.
+    """
+
+    __fields__ = ({'name': 'method', 'child': True},)
+
+    __columns__ = (
+        {'name': 'pattern_name', 'description': ("Name of the pattern."), 'required': True},
+        {'name': 'series_name', 'description': ("Name of the PhotostimulationSeries presenting the pattern."),
+         'required': True},
+        {'name': 'format', 'description': ("Format of the PhotostimulationSeries presenting the pattern ('interval' "
+                                           "or 'series')."), 'required': True},
+        {'name': 'stim_duration', 'description': ("Duration (in sec) the stimulus is presented following onset, or "
+                                                  "NaN if not specified."), 'required': True},
+        {'name': 'mask_shape', 'description': ("Shape of the dense mask of the pattern, i.e., the number of pixels "
+                                               "along its first, second (and third) axes: [height, width] or "
+                                               "[height, width, depth]."), 'required': True},
+        {'name': 'pixel_mask', 'description': ("Pixels stimulated by each 2D pattern."), 'index': True,
+         'required': False},
+        {'name': 'voxel_mask', 'description': ("Voxels stimulated by each 3D pattern."), 'index': True,
+         'required': False},
+        {'name': 'targets', 'description': ("Centers and weights of the targets of each pattern specified by its "
+                                            "ROIs."), 'index': True, 'required': False},
+        {'name': 'roi_size', 'description': ("Size of the targets of each pattern, empty for patterns stored as "
+                                             "masks."), 'index': True, 'required': False},
+    )
+
+    pixel_mask_dtype = np.dtype([('x', np.uint32), ('y', np.uint32), ('weight', np.float32)])
+    voxel_mask_dtype = np.dtype([('x', np.uint32), ('y', np.uint32), ('z', np.uint32), ('weight', np.float32)])
+    targets_dtype = np.dtype([('x', np.float32), ('y', np.float32), ('z', np.float32), ('weight', np.float32)])
+
+    @docval({'name': 'name', 'type': str, 'doc': ("Name of the table."), 'default': 'patterns'},
+            {'name': 'description', 'type': str, 'doc': ("Description of the table."),
+             'default': "Holographic patterns."},
+            *get_docval(DynamicTable.__init__, 'id', 'columns', 'colnames'),
+            {'name': 'method', 'type': PhotostimulationMethod,
+             'doc': ("PhotostimulationMethod shared by all patterns in the table. Defaults to a copy of the method "
+                     "of the first pattern added, with its 'power_per_target'."), 'default': None})
+    def __init__(self, **kwargs):
+        keys_to_set = ('method',)
+        args_to_set = popargs_to_dict(keys_to_set, kwargs)
+
+        super().__init__(**kwargs)
+        for key, val in args_to_set.items():
+            setattr(self, key, val)
+
+    @docval({'name': 'patterns', 'type': Iterable, 'doc': ("HolographicPatterns to add, either all 2D or all 3D.")},
+            {'name': 'series_name', 'type': Iterable,
+             'doc': ("Name of the series presenting each pattern. Defaults to the names of the patterns."),
+             'default': None},
+            {'name': 'format', 'type': Iterable,
+             'doc': ("Format of the series presenting each pattern. Defaults to 'interval'."), 'default': None},
+            {'name': 'stim_duration', 'type': Iterable,
+             'doc': ("Duration (in sec) each pattern is presented for. Defaults to the 'stim_duration' of the "
+                     "patterns."), 'default': None})
+    def add_patterns(self, **kwargs):
+        """
+        Add a row for each pattern, storing the targets of patterns specified by 'pixel_roi', and the pixels of the
+        mask of the other patterns. The methods of the patterns must all have the same content as the method of the
+        table, except for 'power_per_target', which is not stored per pattern (PhotostimulationEventTable stores the
+        power of each event instead).
+        """
+        patterns, series_name, format, stim_duration = getargs('patterns', 'series_name', 'format', 'stim_duration',
+                                                               kwargs)
+        patterns = list(patterns)
+        series_name = [p.name for p in patterns] if series_name is None else list(series_name)
+        format = ['interval'] * len(patterns) if format is None else list(format)
+        if stim_duration is None:
+            stim_duration = [p.stim_duration for p in patterns]
+        stim_duration = [np.nan if d is None else float(d) for d in stim_duration]
+        if not len(patterns) == len(series_name) == len(format) == len(stim_duration):
+            raise ValueError("'patterns', 'series_name', 'format', and 'stim_duration' must be the same length.")
+        if len(patterns) == 0:
+            return
+
+        # the table stores a single method, so the patterns must agree on its content, up to the power
+        methods = {id(p.method): p.method for p in patterns}
+        if self.method is None:
+            self.method = self._copy_method(patterns[0].method)
+        method_key = self._method_key(self.method)
+        if any(self._method_key(m) != method_key for m in methods.values()):
+            raise ValueError("All patterns in a HolographicPatternTable must use PhotostimulationMethods with the same "
+                             "content, except for 'power_per_target'.")
+
+        # pixels index the axes of the dense mask, so its shape is stored rather than 'dimension'
+        has_targets = [p.pixel_roi is not None for p in patterns]
+        mask_shapes = [HolographicPattern._mask_shape(p.dimension) if t else
+                       tuple(int(n) for n in np.shape(p.image_mask)) for p, t in zip(patterns, has_targets)]
+        num_dims = self._check_num_dims(mask_shapes)
+
+        ragged = {}
+        if not all(has_targets):
+            mask_name, mask_dtype = self._mask_column(num_dims)
+            ragged[mask_name] = self._ragged_values([np.zeros((0, num_dims + 1)) if t else p.pixel_mask
+                                                     for p, t in zip(patterns, has_targets)], mask_dtype)
+        if any(has_targets):
+            empty = np.zeros((0, num_dims))
+            ragged['targets'] = self._target_values(
+                [np.asarray(p.pixel_roi, dtype=float) if t else empty for p, t in zip(patterns, has_targets)])
+            ragged['roi_size'] = self._ragged_values([np.atleast_1d(np.asarray(p.roi_size, dtype=float)) if t else []
+                                                      for p, t in zip(patterns, has_targets)], np.dtype(np.float32))
+
+        self._add_rows({'pattern_name': [p.name for p in patterns], 'series_name': series_name, 'format': format,
+                        'stim_duration': np.array(stim_duration, dtype=np.float64),
+                        'mask_shape': np.array(mask_shapes, dtype=np.uint32)}, ragged)
+
+    @docval({'name': 'targets', 'type': 'array_data',
+             'doc': ("Centers ([x, y] or [x, y, z]) of the targets of all patterns, as in 'pixel_roi', grouped by "
+                     "pattern."), 'shape': ((None, 2), (None, 3))},
+            {'name': 'counts', 'type': 'array_data', 'doc': ("Number of targets of each pattern.")},
+            {'name': 'roi_size', 'type': (int, float, Iterable),
+             'doc': ("Size of the targets of all patterns, as in the 'roi_size' of a HolographicPattern.")},
+            {'name': 'dimension', 'type': Iterable,
+             'doc': ("Number of pixels on x, y, (and z) axes of all patterns."), 'shape': ((2,), (3,))},
+            {'name': 'weights', 'type': 'array_data', 'doc': ("Weight of each target. Defaults to 1."),
+             'default': None},
+            {'name': 'pattern_name', 'type': Iterable,
+             'doc': ("Name of each pattern. Defaults to 'pattern' followed by the row of the pattern."),
+             'default': None},
+            {'name': 'series_name', 'type': Iterable,
+             'doc': ("Name of the series presenting each pattern. Defaults to the names of the patterns."),
+             'default': None},
+            {'name': 'format', 'type': Iterable,
+             'doc': ("Format of the series presenting each pattern. Defaults to 'interval'."), 'default': None},
+            {'name': 'stim_duration', 'type': Iterable,
+             'doc': ("Duration (in sec) each pattern is presented for. Defaults to NaN."), 'default': None})
+    def add_targets(self, **kwargs):
+        """
+        Add a row for each pattern given by the centers of its targets, without constructing a HolographicPattern for
+        each pattern. All patterns added in one call share 'roi_size' and 'dimension'.
+        """
+        targets, counts, roi_size, dimension, weights = getargs('targets', 'counts', 'roi_size', 'dimension',
+                                                                'weights', kwargs)
+        pattern_name, series_name, format, stim_duration = getargs('pattern_name', 'series_name', 'format',
+                                                                   'stim_duration', kwargs)
+        targets = np.asarray(targets, dtype=float)
+        counts = np.asarray(counts, dtype=np.int64)
+        roi_size = np.atleast_1d(np.asarray(roi_size, dtype=float))
+        if len(roi_size) not in (1, 2, 3):
+            raise ValueError("'roi_size' must be a scalar, a 2D iterable, or a 3D iterable")
+        if np.any(counts < 0) or counts.sum() != len(targets):
+            raise ValueError("'counts' must be non-negative and sum to the number of 'targets'.")
+        if len(dimension) != targets.shape[1]:
+            raise ValueError("'targets' must have a coordinate for each axis of 'dimension'.")
+        if weights is not None and len(weights) != len(targets):
+            raise ValueError("'weights' must have a value for each target.")
+
+        num_patterns = len(counts)
+        if pattern_name is None:
+            pattern_name = [f'pattern{row}' for row in range(len(self), len(self) + num_patterns)]
+        pattern_name = list(pattern_name)
+        series_name = list(pattern_name) if series_name is None else list(series_name)
+        format = ['interval'] * num_patterns if format is None else list(format)
+        if stim_duration is None:
+            stim_duration = np.full(num_patterns, np.nan)
+        stim_duration = np.asarray(stim_duration, dtype=np.float64)
+        if not num_patterns == len(pattern_name) == len(series_name) == len(format) == len(stim_duration):
+            raise ValueError("'counts', 'pattern_name', 'series_name', 'format', and 'stim_duration' must be the same "
+                             "length.")
+        if num_patterns == 0:
+            return
+
+        shape = HolographicPattern._mask_shape(dimension)
+        self._check_num_dims([shape])
+        self._add_rows({'pattern_name': pattern_name, 'series_name': series_name, 'format': format,
+                        'stim_duration': stim_duration,
+                        'mask_shape': np.tile(np.array(shape, dtype=np.uint32), (num_patterns, 1))},
+                       {'targets': self._target_values([targets], weights=weights, counts=counts),
+                        'roi_size': (np.tile(roi_size.astype(np.float32), num_patterns),
+                                     np.full(num_patterns, len(roi_size), dtype=np.int64))})
+
+    @docval({'name': 'index', 'type': int, 'doc': ("Row of the pattern.")},
+            returns="HolographicPattern with the targets of the pattern as 'pixel_roi', or with its mask as "
+                    "'image_mask_roi'.", rtype=HolographicPattern)
+    def get_pattern(self, **kwargs):
+        """
+        Reconstruct the pattern in a row as a HolographicPattern using the method of the table. The weights of the
+        targets are not kept.
+        """
+        return self._get_pattern(getargs('index', kwargs), self.method)
+
+    def _get_pattern(self, index, method):
+        """
+        Reconstruct the pattern in row 'index' as a HolographicPattern using 'method'.
+        """
+        shape = tuple(int(n) for n in self['mask_shape'][index])
+        name = self['pattern_name'][index]
+        roi_size = self['roi_size'][index] if 'roi_size' in self.colnames else []
+        if len(roi_size) == 0:
+            image_mask_roi = (self.get_mask(index) > 0).astype(np.uint8)
+            return HolographicPattern(name=name, image_mask_roi=image_mask_roi, method=method)
+
+        targets = self['targets'][index]
+        pixel_roi = np.column_stack([targets[field] for field in self.targets_dtype.names[:len(shape)]]).astype(float)
+        roi_size = float(roi_size[0]) if len(roi_size) == 1 else [float(size) for size in roi_size]
+        return HolographicPattern(name=name, pixel_roi=pixel_roi, roi_size=roi_size,
+                                  dimension=(shape[1], shape[0]) + shape[2:], method=method)
+
+    @docval({'name': 'index', 'type': int, 'doc': ("Row of the pattern.")},
+            returns="Dense mask of the pattern.", rtype=np.ndarray)
+    def get_mask(self, **kwargs):
+        """
+        Materialize the dense mask of the pattern in a row, as returned by 'get_masks'.
+        """
+        index = getargs('index', kwargs)
+        return self.get_masks([index])[0]
+
+    @docval({'name': 'indices', 'type': 'array_data',
+             'doc': ("Rows of the patterns, which must all have the same mask shape.")},
+            returns="float32 array of shape [len(indices), *mask shape] with the dense mask of each pattern.",
+            rtype=np.ndarray)
+    def get_masks(self, **kwargs):
+        """
+        Materialize the dense masks of several patterns at once, where each pixel holds the weight of the pixel, or
+        of the last target, covering it, and 0 for background. The ragged columns are read in a single slice each,
+        pixels are assigned at once for all patterns, and targets are rasterized at once for all patterns with the
+        same 'roi_size'.
+        """
+        indices = np.asarray(getargs('indices', kwargs), dtype=np.int64).reshape(-1)
+        if np.any((indices < 0) | (indices >= len(self))):
+            raise ValueError("'indices' must index rows of the table.")
+
+        num_dims = np.shape(self['mask_shape'].data)[1] if len(self) > 0 else 2
+        shapes = np.unique(np.asarray(self['mask_shape'].data[:], dtype=np.int64)[indices].reshape(-1, num_dims),
+                           axis=0)
+        if len(shapes) > 1:
+            raise ValueError("All patterns in 'indices' must have the same mask shape.")
+        shape = tuple(int(n) for n in shapes[0]) if len(shapes) > 0 else (0,) * num_dims
+        masks = np.zeros((len(indices),) + shape, dtype=np.float32)
+
+        mask_name, mask_dtype = self._mask_column(num_dims)
+        if mask_name in self.colnames:
+            pixels, rows = self._read_ragged(mask_name, indices)
+            coords = tuple(pixels[field].astype(np.intp) for field in mask_dtype.names[:-1])
+            masks[(rows,) + coords] = pixels['weight']
+
+        if 'targets' in self.colnames:
+            targets, rows = self._read_ragged('targets', indices)
+            roi_size, size_rows = self._read_ragged('roi_size', indices)
+            splits = np.cumsum(np.bincount(size_rows, minlength=len(indices)))[:-1]
+            groups = {}
+            for row, size in enumerate(np.split(np.asarray(roi_size, dtype=float), splits)):
+                if len(size) > 0:
+                    groups.setdefault(tuple(size), []).append(row)
+
+            dimension = (shape[1], shape[0]) + shape[2:]
+            for size, group_rows in groups.items():
+                in_group = np.isin(rows, group_rows)
+                centers = np.column_stack([targets[field][in_group] for field in self.targets_dtype.names[:num_dims]])
+                roi_index, coords = HolographicPattern._rasterize_rois(dimension, centers,
+                                                                       size[0] if len(size) == 1 else size)
+                masks[(rows[in_group][roi_index],) + coords] = targets['weight'][in_group][roi_index]
+        return masks
+
+    def _read_ragged(self, name, indices):
+        """
+        Values of the ragged column 'name' in the rows 'indices', read in a single slice spanning these rows, along
+        with the position in 'indices' of the row of each value.
+        """
+        index = self[name]
+        ends = np.asarray(index.data[:], dtype=np.int64)
+        starts = np.concatenate(([0], ends[:-1]))[indices]
+        counts = ends[indices] - starts
+        rows = np.repeat(np.arange(len(indices)), counts)
+        if len(rows) == 0:
+            return np.asarray(index.target.data[:0]), rows
+
+        first, last = starts[counts > 0].min(), (starts + counts).max()
+        values = np.asarray(index.target.data[first:last])
+        offsets = np.repeat(starts - first - (np.cumsum(counts) - counts), counts)
+        return values[offsets + np.arange(len(rows))], rows
+
+    def _add_rows(self, columns, ragged):
+        """
+        Add rows given the values of the required columns, and the values and counts per row of the ragged columns
+        used by the rows. Ragged columns the rows do not use get no values in the rows, and ragged columns added for
+        the rows get no values in the existing rows.
+        """
+        num_rows = len(columns['pattern_name'])
+        for col in self.__columns__:
+            name = col['name']
+            if name in ragged and name not in self.colnames:
+                self.add_column(name=name, description=col['description'], data=[[] for _ in range(len(self))],
+                                index=True)
+            elif name not in ragged and col.get('index') and name in self.colnames:
+                ragged[name] = (np.zeros(0, dtype=self._ragged_dtype(name)), np.zeros(num_rows, dtype=np.int64))
+        _extend_columns(self, {**columns, **ragged})
+
+    def _check_num_dims(self, mask_shapes):
+        """
+        Check that the patterns with masks of shapes 'mask_shapes' are all 2D, or all 3D like the patterns in the
+        table, and return their number of dimensions.
+        """
+        num_dims = len(mask_shapes[0]) if len(self) == 0 else len(self['mask_shape'][0])
+        if any(len(d) != num_dims for d in mask_shapes):
+            raise ValueError("All patterns in a HolographicPatternTable must be 2D, or all 3D.")
+        return num_dims
+
+    @staticmethod
+    def _ragged_values(arrays, dtype):
+        """
+        Concatenate the values of each row of a ragged column, given as an array per row with a column per field of
+        'dtype' (or a single column), and return them with their number per row.
+        """
+        counts = np.array([len(a) for a in arrays], dtype=np.int64)
+        values = np.zeros(counts.sum(), dtype=dtype)
+        if counts.sum() > 0:
+            stacked = np.concatenate([np.asarray(a, dtype=float).reshape(len(a), -1) for a in arrays if len(a) > 0])
+            if dtype.names is None:
+                values[:] = stacked[:, 0]
+            else:
+                for i, field in enumerate(dtype.names):
+                    values[field] = stacked[:, i]
+        return values, counts
+
+    @classmethod
+    def _target_values(cls, centers, weights=None, counts=None):
+        """
+        Values of the 'targets' column for patterns given by an array of target centers per pattern (or by a single
+        array and the number of targets per pattern), with z set to 0 for 2D patterns and the weights defaulting to 1.
+        """
+        targets = np.zeros(sum(len(c) for c in centers), dtype=cls.targets_dtype)
+        if len(targets) > 0:
+            stacked = np.concatenate([np.asarray(c, dtype=float).reshape(len(c), -1) for c in centers if len(c) > 0])
+            for i in range(stacked.shape[1]):
+                targets[cls.targets_dtype.names[i]] = stacked[:, i]
+        targets['weight'] = 1. if weights is None else np.asarray(weights, dtype=np.float32)
+        if counts is None:
+            counts = np.array([len(c) for c in centers], dtype=np.int64)
+        return targets, counts
+
+    def _ragged_dtype(self, name):
+        """
+        dtype of the values of the ragged column 'name'.
+        """
+        return {'pixel_mask': self.pixel_mask_dtype, 'voxel_mask': self.voxel_mask_dtype,
+                'targets': self.targets_dtype, 'roi_size': np.dtype(np.float32)}[name]
+
+    @classmethod
+    def _mask_column(cls, num_dims):
+        """
+        Name and compound dtype of the column holding the masks of 2D or 3D patterns.
+        """
+        if num_dims == 2:
+            return 'pixel_mask', cls.pixel_mask_dtype
+        return 'voxel_mask', cls.voxel_mask_dtype
+
+    @classmethod
+    def _method_key(cls, method):
+        """
+        Hash of the content of a PhotostimulationMethod, except for its 'power_per_target'.
+        """
+        return PatternRegistry.content_key(cls._copy_method(method, power_per_target=None))
+
+    @staticmethod
+    def _copy_method(method, **kwargs):
+        """
+        Copy a PhotostimulationMethod along with its SLM and laser, so that the copy can be stored in the table, with
+        the attributes in 'kwargs' replaced. The copies take the names the specification gives these groups.
+        """
+        def copy_device(device, name, keys):
+            if device is None:
+                return None
+            return type(device)(name=name, description=device.description, manufacturer=device.manufacturer,
+                                **{key: getattr(device, key) for key in keys})
+
+        keys = ('stimulus_method', 'sweep_pattern', 'sweep_size', 'time_per_sweep', 'num_sweeps', 'power_per_target',
+                'opsin')
+        kwargs = {**{key: getattr(method, key, None) for key in keys}, **kwargs}
+        return PhotostimulationMethod(name='method', **kwargs,
+                                      slm=copy_device(method.slm, 'slm', ('model', 'size')),
+                                      laser=copy_device(method.laser, 'laser', ('model', 'wavelength', 'power',
+                                                                                'peak_pulse_energy', 'pulse_rate')))
+
+
+@register_class('PhotostimulationEventTable', namespace)
+class PhotostimulationEventTable(DynamicTable):
+    """
+    Table of photostimulation events, with one row per presentation of a pattern in the HolographicPatternTable
+    'patterns'. Stores the presentations of any number of patterns in a few contiguous datasets, as a compact
+    alternative to a PhotostimulationSeries per pattern in a PhotostimulationTable.
+    """
+
+    __fields__ = ({'name': 'patterns', 'child': True},)
+
+    __columns__ = (
+        {'name': 'pattern', 'description': ("Row of the pattern table of the pattern presented."), 'required': True,
+         'table': True},
+        {'name': 'onset', 'description': ("Onset time (in seconds) of the presentation."), 'required': True},
+        {'name': 'offset', 'description': ("Offset time (in seconds) of the presentation."), 'required': True},
+        {'name': 'power', 'description': ("Power (in milliWatts) applied to each target during the presentation."),
+         'required': False},
+    )
+
+    @docval({'name': 'name', 'type': str, 'doc': ("Name of the table.")},
+            {'name': 'description', 'type': str, 'doc': ("Description of the table."),
+             'default': "Photostimulation events."},
+            *get_docval(DynamicTable.__init__, 'id', 'columns', 'colnames'),
+            {'name': 'patterns', 'type': HolographicPatternTable,
+             'doc': ("Table of the patterns presented. Defaults to an empty table."), 'default': None})
+    def __init__(self, **kwargs):
+        patterns = popargs('patterns', kwargs)
+        super().__init__(**kwargs)
+        self.patterns = HolographicPatternTable() if patterns is None else patterns
+        if self.pattern.table is None:
+            self.pattern.table = self.patterns
+
+    @docval({'name': 'pattern', 'type': 'array_data', 'doc': ("Row of the pattern table of each event.")},
+            {'name': 'onset', 'type': 'array_data', 'doc': ("Onset time (in seconds) of each event.")},
+            {'name': 'offset', 'type': 'array_data', 'doc': ("Offset time (in seconds) of each event.")},
+            {'name': 'power', 'type': 'array_data',
+             'doc': ("Power (in milliWatts) applied to each target during each event. Required if the table has a "
+                     "'power' column."), 'default': None})
+    def add_events(self, **kwargs):
+        """
+        Add a row for each event, extending each column at once.
+        """
+        pattern, onset, offset, power = getargs('pattern', 'onset', 'offset', 'power', kwargs)
+        pattern = np.asarray(pattern, dtype=np.int64)
+        onset = np.asarray(onset, dtype=np.float64)
+        offset = np.asarray(offset, dtype=np.float64)
+        if not len(pattern) == len(onset) == len(offset) or (power is not None and len(power) != len(onset)):
+            raise ValueError("'pattern', 'onset', 'offset', and 'power' must be the same length.")
+        if np.any(offset < onset):
+            raise ValueError("'offset' must not be before 'onset'.")
+        if np.any((pattern < 0) | (pattern >= len(self.patterns))):
+            raise ValueError("'pattern' must index rows of the pattern table.")
+        if (power is not None) != ('power' in self.colnames):
+            if len(self) > 0 or power is None:
+                raise ValueError("'power' must be given if and only if the table has a 'power' column.")
+            self.add_column(name='power', description=next(col['description'] for col in self.__columns__
+                                                           if col['name'] == 'power'))
+
+        columns = {'pattern': pattern, 'onset': onset, 'offset': offset}
+        if power is not None:
+            columns['power'] = np.asarray(power, dtype=np.float64)
+        _extend_columns(self, columns)
+
+    @classmethod
+    @docval({'name': 'table', 'type': PhotostimulationTable, 'doc': ("PhotostimulationTable to convert.")},
+            {'name': 'name', 'type': str, 'doc': ("Name of the event table. Defaults to the name of 'table'."),
+             'default': None},
+            returns="PhotostimulationEventTable with the presentations of every series in 'table'.")
+    def from_photostimulation_table(cls, **kwargs):
+        """
+        Convert a PhotostimulationTable to an event table, with a row in the pattern table for the pattern of each
+        series, and a row for each presentation. The power of each event is the 'power_per_target' of the method of
+        its pattern, if any method specifies it.
+        """
+        table, name = getargs('table', 'name', kwargs)
+        series_list = table.series[:]
+        patterns = HolographicPatternTable()
+        patterns.add_patterns([s.pattern for s in series_list], series_name=[s.name for s in series_list],
+                              format=[s.format for s in series_list],
+                              stim_duration=[s.pattern.stim_duration if s.stim_duration is None else s.stim_duration
+                                             for s in series_list])
+
+        events = cls(name=name or table.name, description=table.description, patterns=patterns)
+        intervals, rows = table._get_intervals()
+        power = [s.pattern.method.power_per_target for s in series_list]
+        if all(p is None for p in power):
+            power = None
+        else:
+            power = np.array([np.nan if p is None else p for p in power], dtype=np.float64)[rows]
+        events.add_events(rows, intervals[:, 0], intervals[:, 1], power)
+        return events
+
+    @docval({'name': 'name', 'type': str, 'doc': ("Name of the PhotostimulationTable. Defaults to the name of this "
+                                                  "table."), 'default': None},
+            returns="PhotostimulationTable with a series for each pattern with events.", rtype=PhotostimulationTable)
+    def to_photostimulation_table(self, **kwargs):
+        """
+        Convert the event table to a PhotostimulationTable, with a PhotostimulationSeries in the format of the pattern
+        table for each pattern with at least one event. The method of a pattern whose events all have the same power
+        takes this power as its 'power_per_target'. The series need to be added to an NWBFile before the table is
+        written.
+        """
+        name = getargs('name', kwargs)
+        pattern = np.asarray(self['pattern'].data[:], dtype=np.int64)
+        onset = np.asarray(self['onset'].data[:], dtype=np.float64)
+        offset = np.asarray(self['offset'].data[:], dtype=np.float64)
+        power = np.asarray(self['power'].data[:], dtype=np.float64) if 'power' in self.colnames else None
+        order = np.lexsort((onset, pattern))
+        pattern, onset, offset = pattern[order], onset[order], offset[order]
+        first = np.flatnonzero(np.r_[True, pattern[1:] != pattern[:-1]]) if len(pattern) > 0 else []
+        bounds = np.append(first, len(pattern)).astype(np.int64)
+
+        series_list = []
+        methods = {}
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            row = int(pattern[start])
+            stim_duration = float(self.patterns['stim_duration'][row])
+            stim_duration = None if np.isnan(stim_duration) else stim_duration
+            method = self.patterns.method
+            pattern_power = np.unique(power[order[start:stop]]) if power is not None else []
+            if method is not None and len(pattern_power) == 1 and not np.isnan(pattern_power[0]):
+                pattern_power = float(pattern_power[0])
+                if pattern_power != method.power_per_target:
+                    method = methods.setdefault(pattern_power, self.patterns._copy_method(
+                        method, power_per_target=pattern_power))
+            kwargs = dict(name=self.patterns['series_name'][row], format=self.patterns['format'][row],
+                          stim_duration=stim_duration, pattern=self.patterns._get_pattern(row, method),
+                          validate=False)
+            if kwargs['format'] == 'interval':
+                kwargs['data'] = np.tile(np.array([1, -1], dtype=np.int8), stop - start)
+                kwargs['timestamps'] = np.column_stack((onset[start:stop], offset[start:stop])).ravel()
+            else:
+                kwargs['data'] = np.ones(stop - start, dtype=np.int8)
+                kwargs['timestamps'] = onset[start:stop]
+            series_list.append(PhotostimulationSeries(**kwargs))
+
+        table = PhotostimulationTable(name=name or self.name, description=self.description)
+        if len(series_list) > 0:
+            table.add_series(series_list)
+        return table
@@ -0,0 +1,224 @@
+"""
+Opt-in instrumentation of the public methods of HolographicPattern, PhotostimulationSeries and PhotostimulationTable.
+
+While a Profiler is enabled, the methods are replaced with wrappers that record the number of calls, the cumulative
+wall time and the memory allocated by each method. The original methods are restored when the last Profiler is
+disabled, so instrumentation costs nothing when it is not in use.
+
+Setting the environment variable NDX_PHOTOSTIM_PROFILE to 1 (or to 'time', to skip memory tracing) before importing
+ndx_photostim enables a Profiler for the whole process, available as 'environment_profiler', and prints its report to
+stderr at exit.
+
+Profilers can be used from several threads. On Python < 3.9, where tracemalloc cannot reset its peak, the peak memory
+of a call is the memory it still held when it returned.
+"""
+import atexit
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from .photostim import HolographicPattern, PhotostimulationSeries, PhotostimulationTable
+
+PROFILED_CLASSES = (HolographicPattern, PhotostimulationSeries, PhotostimulationTable)
+
+environment_profiler = None
+
+_active = []
+_originals = {}
+_lock = threading.Lock()
+_local = threading.local()
+# tracemalloc.reset_peak was added in Python 3.9
+_can_reset_peak = hasattr(tracemalloc, 'reset_peak')
+
+
+class Profiler:
+    """
+    Record call counts, cumulative wall time, and allocated memory of the public methods of the ndx_photostim
+    containers while enabled, e.g.:
+
+        with Profiler() as profiler:
+            table.add_series(series)
+        print(profiler.report())
+
+    Times and memory are cumulative, i.e., they include the calls a method makes to other profiled methods. 'allocated'
+    is the memory a call allocated and still held when it returned, and 'peak' the largest memory a single call used
+    above what was allocated when it started. Memory is traced using tracemalloc, which slows down Python code
+    considerably; pass memory=False to only record calls and times.
+    """
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.__stats = {}
+        self.__stats_lock = threading.Lock()
+        self.__started_tracemalloc = False
+
+    @property
+    def enabled(self):
+        return self in _active
+
+    def enable(self):
+        """
+        Start recording calls, and instrument the profiled methods if no other Profiler is enabled.
+        """
+        if self.enabled:
+            raise ValueError("Profiler is already enabled.")
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__started_tracemalloc = True
+        with _lock:
+            if len(_active) == 0:
+                _instrument()
+            _active.append(self)
+
+    def disable(self):
+        """
+        Stop recording calls, and restore the profiled methods if no other Profiler is enabled.
+        """
+        if not self.enabled:
+            raise ValueError("Profiler is not enabled.")
+        with _lock:
+            _active.remove(self)
+            if len(_active) == 0:
+                _restore()
+        if self.__started_tracemalloc:
+            tracemalloc.stop()
+            self.__started_tracemalloc = False
+
+    def reset(self):
+        """
+        Discard the calls recorded so far.
+        """
+        with self.__stats_lock:
+            self.__stats = {}
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+
+    def _record(self, name, elapsed, allocated, peak):
+        with self.__stats_lock:
+            stats = self.__stats.get(name)
+            if stats is None:
+                stats = self.__stats[name] = {'calls': 0, 'time': 0., 'allocated': 0, 'peak': 0}
+            stats['calls'] += 1
+            stats['time'] += elapsed
+            if self.memory:
+                stats['allocated'] += allocated
+                stats['peak'] = max(stats['peak'], peak)
+
+    def to_dict(self):
+        """
+        Return the recorded statistics as a dict mapping 'Class.method' to a dict with the number of 'calls', the
+        cumulative wall 'time' (in seconds), and the 'allocated' and 'peak' memory (in bytes).
+        """
+        with self.__stats_lock:
+            return {name: dict(stats) for name, stats in self.__stats.items()}
+
+    def report(self, sort_by='time'):
+        """
+        Return the recorded statistics as a table, one method per line, sorted by 'sort_by' in descending order.
+        """
+        if sort_by not in ('calls', 'time', 'allocated', 'peak'):
+            raise ValueError("'sort_by' must be one of 'calls', 'time', 'allocated' or 'peak'.")
+        stats = sorted(self.to_dict().items(), key=lambda item: item[1][sort_by], reverse=True)
+        width = max([len('method')] + [len(name) for name, _ in stats])
+        lines = [f"{'method':<{width}} {'calls':>10} {'time (s)':>12} {'per call (ms)':>14} "
+                 f"{'allocated (MiB)':>16} {'peak (MiB)':>11}"]
+        for name, s in stats:
+            lines.append(f"{name:<{width}} {s['calls']:>10} {s['time']:>12.4f} {1e3 * s['time'] / s['calls']:>14.4f} "
+                         f"{s['allocated'] / 2 ** 20:>16.2f} {s['peak'] / 2 ** 20:>11.2f}")
+        return '\n'.join(lines)
+
+
+def _profiled_methods(cls):
+    """
+    Yield the name of each public method (and '__init__') defined on 'cls' itself, with the function implementing it
+    and the descriptor type it is wrapped in, if any.
+    """
+    for name, attr in list(vars(cls).items()):
+        if name.startswith('_') and name != '__init__':
+            continue
+        if isinstance(attr, (staticmethod, classmethod)):
+            yield name, attr, attr.__func__, type(attr)
+        elif callable(attr) and not isinstance(attr, type):
+            yield name, attr, attr, None
+
+
+def _instrument():
+    for cls in PROFILED_CLASSES:
+        for name, attr, func, descriptor in _profiled_methods(cls):
+            _originals[(cls, name)] = attr
+            wrapper = _wrap(func, f'{cls.__name__}.{name}')
+            setattr(cls, name, wrapper if descriptor is None else descriptor(wrapper))
+
+
+def _restore():
+    for (cls, name), attr in _originals.items():
+        setattr(cls, name, attr)
+    _originals.clear()
+
+
+def _wrap(func, name):
+    """
+    Return a wrapper around 'func' that records each call under 'name' in the enabled Profilers.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tracing = tracemalloc.is_tracing()
+        # peak memory of the calls in progress in this thread, since tracemalloc keeps a single peak
+        peaks = getattr(_local, 'peaks', None)
+        if peaks is None:
+            peaks = _local.peaks = []
+        if tracing:
+            start_memory, outer_peak = _traced_memory()
+            if peaks:
+                peaks[-1] = max(peaks[-1], outer_peak)
+            if _can_reset_peak:
+                tracemalloc.reset_peak()
+        peaks.append(0)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = peaks.pop()
+            allocated = 0
+            if tracing and tracemalloc.is_tracing():
+                end_memory, end_peak = _traced_memory()
+                peak = max(peak, end_peak)
+                allocated = end_memory - start_memory
+                peak -= start_memory
+                if peaks:
+                    peaks[-1] = max(peaks[-1], peak + start_memory)
+            for profiler in list(_active):
+                profiler._record(name, elapsed, allocated, max(peak, 0))
+    return wrapper
+
+
+def _traced_memory():
+    """
+    Current traced memory, and peak traced memory since the last reset, or the current memory if tracemalloc cannot
+    reset its peak.
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    return current, peak if _can_reset_peak else current
+
+
+def _profile_from_environment():
+    """
+    Enable a Profiler for the whole process if NDX_PHOTOSTIM_PROFILE is set, and print its report to stderr at exit.
+    """
+    global environment_profiler
+    setting = os.environ.get('NDX_PHOTOSTIM_PROFILE', '').lower()
+    if setting in ('', '0', 'false') or environment_profiler is not None:
+        return
+
+    environment_profiler = Profiler(memory=setting != 'time')
+    environment_profiler.enable()
+    atexit.register(lambda: print(environment_profiler.report(), file=sys.stderr))
@@ -1,10 +1,13 @@
 import os
 from datetime import datetime
 
+import h5py
 import numpy as np
 from dateutil.tz import tzlocal
+from hdmf.data_utils import DataChunkIterator
 from ndx_photostim import SpatialLightModulator, Laser, PhotostimulationMethod, HolographicPattern, \
-                             PhotostimulationSeries, PhotostimulationTable
+                             PhotostimulationSeries, PhotostimulationTable, PatternRegistry, \
+                             PhotostimulationEventTable, HolographicPatternTable
 from pynwb import NWBFile, NWBHDF5IO
 from pynwb.testing import TestCase
 
@@ -102,3 +105,283 @@ class TestIO(TestCase):
         # cleanup workspace
         if os.path.exists(self.path):
             os.remove(self.path)
+
+    def test_read_unvalidated_presentations(self):
+        """
+        Check that series written without validation, as earlier versions wrote them, are read back in without
+        checking their presentations.
+        """
+        ps_method = PhotostimulationMethod(name="methodA")
+        hp = HolographicPattern(name='pattern1', image_mask_roi=np.ones((5, 5)), method=ps_method)
+        s1 = PhotostimulationSeries(name="series_1", format='interval', data=[-1, 1, 1, -1],
+                                    timestamps=[0.4, 0.9, 0.5, 3.9], pattern=hp, validate=False)
+        self.nwbfile.add_stimulus(s1)
+
+        with NWBHDF5IO(self.path, "w") as io:
+            io.write(self.nwbfile)
+
+        with NWBHDF5IO(self.path, mode='r', load_namespaces=True) as io:
+            read_series = io.read().stimulus['series_1']
+            np.testing.assert_array_equal(read_series.data[:], [-1, 1, 1, -1])
+            np.testing.assert_array_equal(read_series.timestamps[:], [0.4, 0.9, 0.5, 3.9])
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_roundtrip_appended_data(self):
+        """
+        Check that presentations added after constructing a PhotostimulationSeries are written.
+        """
+        ps_method = PhotostimulationMethod(name="methodA")
+        hp = HolographicPattern(name='pattern1', image_mask_roi=np.ones((5, 5)), method=ps_method)
+        s1 = PhotostimulationSeries(name="series_1", format='interval', data=[1, -1], timestamps=[0.5, 1],
+                                    pattern=hp, stim_duration=0.5)
+        s1.add_interval(2., 3.)
+        s1.add_onsets(np.arange(4, 400))
+        self.nwbfile.add_stimulus(s1)
+
+        with NWBHDF5IO(self.path, "w") as io:
+            io.write(self.nwbfile)
+
+        with NWBHDF5IO(self.path, mode='r', load_namespaces=True) as io:
+            read_series = io.read().stimulus['series_1']
+            np.testing.assert_array_equal(read_series.data[:], s1.data)
+            np.testing.assert_array_equal(read_series.timestamps[:], s1.timestamps)
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_roundtrip_shared_patterns(self):
+        """
+        Check that identical patterns of series constructed with a PatternRegistry are written once, linked from the
+        other series, and read back unchanged.
+        """
+        registry = PatternRegistry()
+        series = []
+        for i in range(4):
+            ps_method = PhotostimulationMethod(name="methodA", stimulus_method="scanless")
+            hp = HolographicPattern(name='pattern', image_mask_roi=np.eye(5)[:, ::(1 if i < 3 else -1)],
+                                    method=ps_method)
+            series.append(PhotostimulationSeries(name=f"series_{i}", format='interval', data=[1, -1],
+                                                 timestamps=[i, i + 0.5], pattern=hp, pattern_registry=registry))
+        [self.nwbfile.add_stimulus(s) for s in series]
+
+        with NWBHDF5IO(self.path, "w") as io:
+            io.write(self.nwbfile)
+
+        with h5py.File(self.path, 'r') as f:
+            links = [type(f['stimulus/presentation'][f'series_{i}'].get('pattern', getlink=True)) for i in range(4)]
+            self.assertEqual(links, [h5py.HardLink, h5py.SoftLink, h5py.SoftLink, h5py.HardLink])
+
+        with NWBHDF5IO(self.path, mode='r', load_namespaces=True) as io:
+            read_stimulus = io.read().stimulus
+            for i in range(4):
+                np.testing.assert_array_equal(read_stimulus[f'series_{i}'].pattern.image_mask_roi[:],
+                                              series[i].pattern.image_mask)
+                self.assertEqual(read_stimulus[f'series_{i}'].pattern.method.stimulus_method, 'scanless')
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_roundtrip_event_table(self):
+        """
+        Convert a PhotostimulationTable to a PhotostimulationEventTable, and check that it is written as a few
+        contiguous datasets and read back in correctly.
+        """
+        ps_method = PhotostimulationMethod(name="methodA", power_per_target=5.)
+        series = []
+        for i, mask in enumerate([np.eye(5), np.ones((4, 6))]):
+            hp = HolographicPattern(name=f'pattern{i}', image_mask_roi=mask, method=ps_method)
+            series.append(PhotostimulationSeries(name=f"series_{i}", format='interval', data=[1, -1, 1, -1],
+                                                 timestamps=[i, i + 0.5, i + 2, i + 3], pattern=hp))
+        stim_table = PhotostimulationTable(name='test', description='...')
+        stim_table.add_series(series)
+        events = PhotostimulationEventTable.from_photostimulation_table(stim_table, name='events')
+        module = self.nwbfile.create_processing_module(name="test_module", description="...")
+        module.add(events)
+
+        with NWBHDF5IO(self.path, "w") as io:
+            io.write(self.nwbfile)
+
+        with h5py.File(self.path, 'r') as f:
+            self.assertEqual(f['processing/test_module/events/onset'].shape, (4,))
+            self.assertEqual(f['processing/test_module/events/patterns/pixel_mask'].shape, (29,))
+
+        with NWBHDF5IO(self.path, mode='r', load_namespaces=True) as io:
+            read_events = io.read().processing['test_module']['events']
+            self.assertContainerEqual(events, read_events, ignore_hdmf_attrs=True)
+            read_table = read_events.to_photostimulation_table()
+            for s, read_series in zip(series, read_table.series[:]):
+                np.testing.assert_array_equal(read_series.timestamps, s.timestamps)
+                np.testing.assert_array_equal(read_series.pattern.image_mask, s.pattern.image_mask)
+                self.assertEqual(read_series.pattern.method.power_per_target, 5.)
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_roundtrip_pattern_library(self):
+        """
+        Store a library of patterns given by their targets in a HolographicPatternTable, and check that the targets are
+        written as contiguous ragged datasets and that the masks are materialized from the file.
+        """
+        rng = np.random.default_rng(0)
+        counts = rng.integers(0, 6, 200)
+        targets = rng.uniform(0, 64, (counts.sum(), 2))
+        patterns = HolographicPatternTable(method=PhotostimulationMethod(name="method"))
+        patterns.add_targets(targets=targets, counts=counts, roi_size=5, dimension=[64, 48],
+                             weights=rng.uniform(0.5, 1, len(targets)))
+        patterns.add_patterns([HolographicPattern(name='mask', image_mask_roi=np.eye(48, 64),
+                                                  method=PhotostimulationMethod(name="method"))])
+        module = self.nwbfile.create_processing_module(name="test_module", description="...")
+        module.add(patterns)
+
+        with NWBHDF5IO(self.path, "w") as io:
+            io.write(self.nwbfile)
+
+        with h5py.File(self.path, 'r') as f:
+            self.assertEqual(f['processing/test_module/patterns/targets'].shape, (counts.sum(),))
+            self.assertEqual(f['processing/test_module/patterns/roi_size'].shape, (200,))
+            self.assertEqual(f['processing/test_module/patterns/pixel_mask'].shape, (48,))
+
+        with NWBHDF5IO(self.path, mode='r', load_namespaces=True) as io:
+            read_patterns = io.read().processing['test_module']['patterns']
+            indices = [3, 150, 200, 7]
+            np.testing.assert_array_equal(read_patterns.get_masks(indices), patterns.get_masks(indices))
+            np.testing.assert_array_equal(read_patterns.get_mask(200), np.eye(48, 64))
+            np.testing.assert_array_equal(read_patterns.get_pattern(3).pixel_roi,
+                                          targets[counts[:3].sum():counts[:4].sum()].astype(np.float32))
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_roundtrip_pattern_library_name(self):
+        """
+        Check that a HolographicPatternTable stored outside of an event table keeps its own name.
+        """
+        patterns = HolographicPatternTable(name='library', method=PhotostimulationMethod(name="method"))
+        patterns.add_targets(targets=[[2, 2], [5, 6]], counts=[1, 1], roi_size=3, dimension=[8, 10])
+        module = self.nwbfile.create_processing_module(name="test_module", description="...")
+        module.add(patterns)
+
+        with NWBHDF5IO(self.path, "w") as io:
+            io.write(self.nwbfile)
+
+        with NWBHDF5IO(self.path, mode='r', load_namespaces=True) as io:
+            read_patterns = io.read().processing['test_module']['library']
+            self.assertEqual(read_patterns.name, 'library')
+            np.testing.assert_array_equal(read_patterns.get_masks([0, 1]), patterns.get_masks([0, 1]))
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_mask_cache_rewritten_file(self):
+        """
+        Check that masks derived from a pattern read from a file are not reused after the file is rewritten at the
+        same path with a different mask.
+        """
+        for image_mask_roi in [np.eye(5), np.ones((5, 5))]:
+            nwbfile = NWBFile(session_description='session_description', identifier='identifier',
+                              session_start_time=datetime.now(tzlocal()))
+            hp = HolographicPattern(name='pattern1', image_mask_roi=image_mask_roi,
+                                    method=PhotostimulationMethod(name="methodA"))
+            nwbfile.add_stimulus(PhotostimulationSeries(name="series_1", format='interval', data=[1, -1],
+                                                        timestamps=[0.5, 1], pattern=hp))
+            with NWBHDF5IO(self.path, "w") as io:
+                io.write(nwbfile)
+
+            with NWBHDF5IO(self.path, mode='r', load_namespaces=True) as io:
+                read_pattern = io.read().stimulus['series_1'].pattern
+                self.assertEqual(len(read_pattern.pixel_mask), image_mask_roi.sum())
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_roundtrip_streaming(self):
+        """
+        Write one series from a data chunk iterator and one appendable series, add presentations to the appendable
+        series after writing the file and after reopening it, and check that all presentations are read back in.
+        """
+        ps_method = PhotostimulationMethod(name="methodA")
+        hp = HolographicPattern(name='pattern1', image_mask_roi=np.ones((5, 5)), method=ps_method)
+        s1 = PhotostimulationSeries(name="series_1", format='interval', data=[1, -1], timestamps=[0.5, 1],
+                                    pattern=hp, stim_duration=0.5, appendable=True, chunk_size=16)
+        s2 = PhotostimulationSeries(name="series_2", format='series',
+                                    data=DataChunkIterator(data=iter([0, 1, 1, 0, 1]), buffer_size=2),
+                                    timestamps=np.arange(5.), pattern=hp, stim_duration=0.1)
+        [self.nwbfile.add_stimulus(s) for s in [s1, s2]]
+
+        with NWBHDF5IO(self.path, "w") as io:
+            io.write(self.nwbfile)
+            s1.add_onsets(np.arange(2, 50))
+            s1.flush()
+
+        with NWBHDF5IO(self.path, mode='a', load_namespaces=True) as io:
+            read_series = io.read().stimulus['series_1']
+            read_series.add_onsets([100, 200])
+            read_series.flush()
+
+        with NWBHDF5IO(self.path, mode='r', load_namespaces=True) as io:
+            read_nwbfile = io.read()
+            read_series = read_nwbfile.stimulus['series_1']
+            self.assertEqual(read_series.data.maxshape, (None,))
+            self.assertEqual(read_series.data.chunks, (16,))
+            np.testing.assert_array_equal(read_series.data[:], np.tile([1, -1], 51))
+            np.testing.assert_array_equal(read_series.timestamps[:4], [0.5, 1, 2, 2.5])
+            np.testing.assert_array_equal(read_series.timestamps[-4:], [100, 100.5, 200, 200.5])
+            np.testing.assert_array_equal(read_nwbfile.stimulus['series_2'].data[:], [0, 1, 1, 0, 1])
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_roundtrip_appendable_unflushed(self):
+        """
+        Check that appendable series with no presentations, or with only the presentations they were constructed with,
+        are written without calling 'flush' and read back in.
+        """
+        ps_method = PhotostimulationMethod(name="methodA")
+        hp = HolographicPattern(name='pattern1', image_mask_roi=np.ones((5, 5)), method=ps_method)
+        s1 = PhotostimulationSeries(name="series_1", format='interval', pattern=hp, stim_duration=0.5,
+                                    appendable=True)
+        s2 = PhotostimulationSeries(name="series_2", format='interval', data=[1, -1, 1, -1],
+                                    timestamps=[0.5, 1, 2, 2.5], pattern=hp, appendable=True)
+        [self.nwbfile.add_stimulus(s) for s in [s1, s2]]
+
+        with NWBHDF5IO(self.path, "w") as io:
+            io.write(self.nwbfile)
+        s1.flush()
+
+        with NWBHDF5IO(self.path, mode='r', load_namespaces=True) as io:
+            read_stimulus = io.read().stimulus
+            self.assertEqual(len(read_stimulus['series_1'].data), 0)
+            self.assertEqual(len(read_stimulus['series_1'].timestamps), 0)
+            np.testing.assert_array_equal(read_stimulus['series_2'].data[:], [1, -1, 1, -1])
+            np.testing.assert_array_equal(read_stimulus['series_2'].timestamps[:], [0.5, 1, 2, 2.5])
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_image_mask_roi_storage(self):
+        """
+        Check that image_mask_roi is written as a chunked, compressed uint8 dataset, and read back unchanged.
+        """
+        ps_method = PhotostimulationMethod(name="methodA")
+        image_mask_roi = np.zeros((600, 300))
+        image_mask_roi[100:120, 40:60] = 1
+        hp = HolographicPattern(name='pattern1', image_mask_roi=image_mask_roi, method=ps_method)
+        s1 = PhotostimulationSeries(name="series_1", format='interval', data=[1, -1], timestamps=[0.5, 1],
+                                    pattern=hp)
+        self.nwbfile.add_stimulus(s1)
+
+        with NWBHDF5IO(self.path, "w") as io:
+            io.write(self.nwbfile)
+
+        with NWBHDF5IO(self.path, mode='r', load_namespaces=True) as io:
+            read_nwbfile = io.read()
+            dset = read_nwbfile.stimulus['series_1'].pattern.image_mask_roi
+            self.assertEqual(dset.dtype, np.uint8)
+            self.assertEqual(dset.compression, 'gzip')
+            self.assertEqual(dset.chunks, (512, 300))
+            np.testing.assert_array_equal(dset[:], image_mask_roi)
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
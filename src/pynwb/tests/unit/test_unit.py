@@ -1,12 +1,17 @@
 from datetime import datetime
 import numpy as np
 from ndx_photostim import SpatialLightModulator, Laser, PhotostimulationMethod, HolographicPattern, \
-                             PhotostimulationSeries, PhotostimulationTable
+                             PhotostimulationSeries, PhotostimulationTable, PatternRegistry, \
+                             HolographicPatternTable, PhotostimulationEventTable
 from pynwb import NWBFile
 from pynwb.testing import TestCase
 from dateutil.tz import tzlocal
-from pynwb import NWBFile, NWBHDF5IO
+from pynwb import NWBFile, NWBHDF5IO, TimeSeries
 import os
+import subprocess
+import sys
+import h5py
+from hdmf.data_utils import DataChunkIterator
 import matplotlib.pyplot as plt
 
 def get_SLM():
@@ -144,6 +149,192 @@ class TestHolographicPattern(TestCase):
         with self.assertRaises(TypeError):
             HolographicPattern(name='hp', pixel_roi=pixel_roi, roi_size=[8, 4], method=ps_method)
 
+    def test_pixel_to_image_mask_roi_matches_full_frame_masks(self):
+        '''Test that bounding-box rasterization matches stamping full-frame masks for each ROI.'''
+        ps_method = get_photostim_method()
+        rng = np.random.default_rng(0)
+        pixel_roi = np.concatenate([rng.integers(-3, 103, size=(20, 2)), rng.uniform(-3, 103, size=(20, 2))])
+
+        for roi_size in [8, 7.5, 1, [8, 4], [3, 5.5]]:
+            hp = HolographicPattern(name='hp', pixel_roi=pixel_roi, roi_size=roi_size, dimension=[100, 100],
+                                    method=ps_method)
+
+            expected = np.zeros((100, 100))
+            for roi in pixel_roi:
+                if isinstance(roi_size, list):
+                    expected[HolographicPattern._create_rectangular_mask((100, 100), roi, roi_size)] = 1
+                else:
+                    expected[HolographicPattern._create_circular_mask((100, 100), roi, roi_size)] = 1
+
+            np.testing.assert_array_equal(hp.pixel_to_image_mask_roi(), expected)
+
+    def test_pixel_to_image_mask_roi_3d(self):
+        '''Test rasterization of cylinder and cuboid ROIs for 3D 'pixel_roi' patterns.'''
+        ps_method = get_photostim_method()
+        rng = np.random.default_rng(0)
+        pixel_roi = np.column_stack([rng.uniform(-3, 43, size=(15, 2)), rng.integers(0, 6, size=15)])
+        dimension = [40, 30, 6]
+
+        for roi_size in [6, [6, 4, 3], [5, 5]]:
+            hp = HolographicPattern(name='hp', pixel_roi=pixel_roi, roi_size=roi_size, dimension=dimension,
+                                    method=ps_method)
+
+            expected = np.zeros((30, 40, 6))
+            for roi in pixel_roi:
+                if isinstance(roi_size, list):
+                    expected[HolographicPattern._create_rectangular_mask(dimension, roi, roi_size)] = 1
+                else:
+                    expected[HolographicPattern._create_circular_mask(dimension, roi, roi_size)] = 1
+
+            np.testing.assert_array_equal(hp.pixel_to_image_mask_roi(), expected)
+
+        hp.show_mask()
+        hp.show_mask(plane=2)
+
+    def test_pixel_to_image_mask_roi_3d_fractional_depth(self):
+        '''Test that cylinders and two-element ROIs with a fractional depth lie in the single nearest plane.'''
+        ps_method = get_photostim_method()
+        pixel_roi = [[10, 10, 2.5], [25, 15, 1.4], [30, 5, 3.6]]
+        for roi_size in [6, [5, 5]]:
+            hp = HolographicPattern(name='hp', pixel_roi=pixel_roi, roi_size=roi_size, dimension=[40, 30, 6],
+                                    method=ps_method)
+            label = hp.pixel_to_image_mask_roi(output='label')
+            for i, plane in enumerate([3, 1, 4]):
+                planes = np.unique(np.nonzero(label == i + 1)[2])
+                np.testing.assert_array_equal(planes, [plane])
+
+    def test_pixel_to_image_mask_roi_outputs(self):
+        '''Test label, coordinate, and sparse outputs agree with the dense mask.'''
+        ps_method = get_photostim_method()
+        pixel_roi = [[10, 10], [14, 10], [60, 70], [98, 2]]
+        hp = HolographicPattern(name='hp', pixel_roi=pixel_roi, roi_size=8, dimension=[100, 100], method=ps_method)
+
+        dense = hp.pixel_to_image_mask_roi()
+        assert dense.dtype == np.float64
+        assert hp.pixel_to_image_mask_roi(dtype=np.uint8).dtype == np.uint8
+
+        label = hp.pixel_to_image_mask_roi(output='label')
+        assert label.dtype == np.uint16
+        np.testing.assert_array_equal(label > 0, dense > 0)
+        assert label[10, 7] == 1
+        assert label[10, 14] == 2
+        assert label[70, 60] == 3
+
+        coords = hp.pixel_to_image_mask_roi(output='coords')
+        assert len(coords) == len(pixel_roi)
+        for i, roi_coords in enumerate(coords):
+            roi_mask = HolographicPattern._create_circular_mask((100, 100), pixel_roi[i], 8)
+            np.testing.assert_array_equal(roi_coords, np.argwhere(roi_mask))
+
+        sparse = hp.pixel_to_image_mask_roi(output='sparse')
+        assert sparse.shape == (4, 100 * 100)
+        np.testing.assert_array_equal(sparse.toarray().max(axis=0).reshape(100, 100), dense)
+
+    def test_pixel_to_image_mask_roi_requires_pixel_roi(self):
+        '''Test that converting a pattern specified by 'image_mask_roi' raises a clear error.'''
+        hp = HolographicPattern(name='hp', image_mask_roi=np.eye(5), method=get_photostim_method())
+        with self.assertRaisesWith(ValueError, "'pixel_to_image_mask_roi' requires a pattern specified by "
+                                               "'pixel_roi'; use 'image_mask' for patterns specified by "
+                                               "'image_mask_roi'."):
+            hp.pixel_to_image_mask_roi()
+
+    def test_mask_cache(self):
+        '''Test that derived masks are computed once, keyed on pattern content, and evicted least-recently-used.'''
+        ps_method = get_photostim_method()
+        pixel_roi = np.array([[10, 10], [60, 70]])
+        hp = HolographicPattern(name='hp', pixel_roi=pixel_roi, roi_size=8, dimension=[100, 100], method=ps_method)
+
+        mask = hp.pixel_to_image_mask_roi()
+        assert hp.pixel_to_image_mask_roi() is mask
+        assert hp.image_mask is mask
+        assert not mask.flags.writeable
+        np.testing.assert_array_equal(hp.pixel_mask[:, :2], np.argwhere(mask))
+
+        # patterns with the same content share cached masks
+        hp2 = HolographicPattern(name='hp2', pixel_roi=pixel_roi.copy(), roi_size=8, dimension=[100, 100],
+                                 method=ps_method)
+        assert hp2.pixel_to_image_mask_roi() is mask
+
+        # fields are set once, so the cached masks are kept when setting one again fails
+        with self.assertRaises(AttributeError):
+            hp.roi_size = 4
+        assert hp.pixel_to_image_mask_roi() is mask
+
+        # modifying 'pixel_roi' in place gives a new mask
+        pixel_roi[0] = [50, 50]
+        assert hp.pixel_to_image_mask_roi()[50, 50] == 1
+        assert hp.pixel_to_image_mask_roi()[10, 10] == 0
+        pixel_roi[0] = [10, 10]
+        assert hp.pixel_to_image_mask_roi() is mask
+
+        # clearing the cache removes the masks derived from the pattern (its two dense masks and its pixel mask),
+        # including those shared with hp2
+        num_cached = len(HolographicPattern.mask_cache)
+        hp.clear_mask_cache()
+        assert len(HolographicPattern.mask_cache) == num_cached - 3
+        assert hp.pixel_to_image_mask_roi() is not mask
+        assert hp2.pixel_to_image_mask_roi() is not mask
+
+        cache = HolographicPattern.mask_cache
+        maxsize = cache.maxsize
+        try:
+            cache.maxsize = 2
+            for i in range(5):
+                hp.pixel_to_image_mask_roi(dtype=['f8', 'f4', 'u8', 'u4', 'u1'][i])
+            assert len(cache) == 2
+        finally:
+            cache.maxsize = maxsize
+
+    def test_image_to_pixel(self):
+        '''Test conversion of 2D and 3D masks, in memory and chunk by chunk from HDF5, into pixel masks.'''
+        image_mask = np.zeros((20, 30))
+        image_mask[2, 5] = 1
+        image_mask[7, 1] = 0.5
+        image_mask[19, 29] = 2
+
+        pixel_mask = HolographicPattern.image_to_pixel(image_mask)
+        np.testing.assert_array_equal(pixel_mask, [[2, 5, 1], [7, 1, 0.5], [19, 29, 2]])
+        np.testing.assert_array_equal(HolographicPattern.image_to_pixel(image_mask, chunk_size=3), pixel_mask)
+
+        volume = np.zeros((10, 10, 4), dtype=np.uint8)
+        volume[1, 2, 3] = 1
+        volume[8, 0, 0] = 1
+        np.testing.assert_array_equal(HolographicPattern.image_to_pixel(volume), [[1, 2, 3, 1], [8, 0, 0, 1]])
+
+        path = 'test_image_to_pixel.h5'
+        with h5py.File(path, 'w') as f:
+            dset = f.create_dataset('image_mask_roi', data=image_mask, chunks=(4, 30))
+            np.testing.assert_array_equal(HolographicPattern.image_to_pixel(dset), pixel_mask)
+        os.remove(path)
+
+    def test_image_to_pixel_chunked_volume(self):
+        '''Test that a 3D mask chunked one plane deep is converted from HDF5 one chunk at a time.'''
+        volume = (np.random.default_rng(0).random((32, 48, 5)) > 0.95).astype(np.float32)
+
+        class ReadRecorder:
+            '''Dataset proxy recording the size of each read.'''
+            def __init__(self, dset):
+                self.dset, self.chunks, self.reads = dset, dset.chunks, []
+
+            def __len__(self):
+                return len(self.dset)
+
+            def iter_chunks(self):
+                return self.dset.iter_chunks()
+
+            def __getitem__(self, selection):
+                values = self.dset[selection]
+                self.reads.append(values.size)
+                return values
+
+        path = 'test_image_to_pixel.h5'
+        with h5py.File(path, 'w') as f:
+            dset = ReadRecorder(f.create_dataset('image_mask_roi', data=volume, chunks=(16, 16, 1)))
+            np.testing.assert_array_equal(HolographicPattern.image_to_pixel(dset),
+                                          HolographicPattern.image_to_pixel(volume))
+            assert len(dset.reads) == 2 * 3 * 5 and max(dset.reads) == 16 * 16
+        os.remove(path)
+
     @staticmethod
     def _create_pixel_roi():
         '''Helper function to create pixel_roi at 5 randomly selected coordinates.'''
@@ -210,6 +401,42 @@ class TestPhotostimulationSeries(TestCase):
             PhotostimulationSeries(name="photosim series", pattern=hp, format='series',
                                data=[0, 0, 0, 1, 2, 0], rate=10.)
 
+    def test_validation(self):
+        '''Test validation of alternation and ordering of presentations, in full and in chunks, and opting out of it.'''
+        hp = get_holographic_pattern()
+        invalid = [('interval', [1, 1, -1], [0, 1, 2]),
+                   ('interval', [1, -1, 1, -1], [2, 3, 0, 4]),
+                   ('interval', [1, -1], [2, 1]),
+                   ('series', [1, 0, 1], [0, 2, 1])]
+        for format, data, timestamps in invalid:
+            with self.assertRaises(ValueError):
+                PhotostimulationSeries(name="series_1", format=format, data=data, timestamps=timestamps,
+                                       stim_duration=0.1, pattern=hp)
+            PhotostimulationSeries(name="series_1", format=format, data=data, timestamps=timestamps,
+                                   stim_duration=0.1, pattern=hp, validate=False)
+
+        # data starting with an offset were accepted by earlier versions, so they only raise a warning
+        with self.assertWarns(UserWarning):
+            PhotostimulationSeries(name="series_1", format='interval', data=[-1, 1, -1, 1], timestamps=[3, 0, 1, 2],
+                                   pattern=hp)
+        with self.assertRaises(ValueError):
+            PhotostimulationSeries(name="series_1", format='interval', data=[-1, -1], timestamps=[0, 1], pattern=hp)
+
+        # overlapping intervals are allowed, as long as onsets are in order
+        PhotostimulationSeries(name="series_1", format='interval', data=[1, -1, 1, -1], timestamps=[0, 5, 1, 2],
+                               pattern=hp)
+
+        data = DataChunkIterator(data=iter([1, -1, 1, -1, -1]), buffer_size=2)
+        timestamps = DataChunkIterator(data=iter([0., 2., 1., 1.5, 0.5]), buffer_size=2)
+        ps = PhotostimulationSeries(name="series_1", format='interval', data=data, timestamps=timestamps, pattern=hp)
+        for _ in range(2):
+            next(ps.data)
+            next(ps.timestamps)
+        with self.assertRaises(ValueError):
+            next(ps.data)
+        with self.assertRaises(ValueError):
+            next(ps.timestamps)
+
     def test_add_interval(self):
         '''Test 'add_interval' method on 'interval' type series.'''
         hp = get_holographic_pattern()
@@ -229,6 +456,167 @@ class TestPhotostimulationSeries(TestCase):
         stim_series_2.add_interval(10., 20.)
         stim_series_2.add_interval(35., 40.)
 
+        # intervals are not checked against the presentations already in the series
+        stim_series_2.add_interval(5., 5.)
+        stim_series_2.add_interval(2., 4.)
+        np.testing.assert_array_equal(stim_series_2.timestamps, [1, 3, 10, 20, 35, 40, 5, 5, 2, 4])
+        stim_series_2.add_intervals([45.], [45.])
+        with self.assertRaises(ValueError):
+            stim_series_2.add_intervals([38.], [39.])
+        with self.assertRaises(ValueError):
+            stim_series_2.add_intervals([50.], [49.])
+
+    def test_add_intervals(self):
+        '''Test bulk 'add_intervals' and 'add_onsets', and validation of the added presentations.'''
+        hp = get_holographic_pattern()
+        ps = PhotostimulationSeries(name="series_1", format='interval', data=[1, -1], timestamps=[0.5, 1],
+                                    pattern=hp, stim_duration=1)
+        ps.add_intervals(np.arange(2, 10, 2), np.arange(2, 10, 2) + 0.5)
+        ps.add_onsets(np.array([20, 30]), check_overlap=True)
+        np.testing.assert_array_equal(ps.data, np.tile([1, -1], 7))
+        np.testing.assert_array_equal(ps.timestamps, [0.5, 1, 2, 2.5, 4, 4.5, 6, 6.5, 8, 8.5, 20, 21, 30, 31])
+
+        with self.assertRaises(ValueError):
+            ps.add_intervals([40, 50], [45])
+        with self.assertRaises(ValueError):
+            ps.add_intervals([40, 50], [45, 49])
+        with self.assertRaises(ValueError):
+            ps.add_intervals([50, 40], [55, 45])
+        with self.assertRaises(ValueError):
+            ps.add_intervals([25], [26])
+        with self.assertRaises(ValueError):
+            ps.add_intervals([30.5, 40], [35, 45], check_overlap=True)
+        with self.assertRaises(ValueError):
+            ps.add_intervals([40, 42], [45, 47], check_overlap=True)
+        assert len(ps.data) == 14
+
+        ps.add_intervals([30.5, 40], [35, 45])
+        assert len(ps.data) == 18
+
+        ps = PhotostimulationSeries(name="series_2", format='series', pattern=hp, stim_duration=2)
+        ps.add_onsets([1, 2, 5])
+        with self.assertRaises(ValueError):
+            ps.add_onsets([6, 9], check_overlap=True)
+        ps.add_onsets([7, 9], check_overlap=True)
+        np.testing.assert_array_equal(ps.timestamps, [1, 2, 5, 7, 9])
+        np.testing.assert_array_equal(ps.data, [1, 1, 1, 1, 1])
+
+    def test_data_storage(self):
+        '''Test that data and timestamps are kept as typed arrays, grown in place, and returned as views.'''
+        hp = get_holographic_pattern()
+        ps = PhotostimulationSeries(name="series_1", format='interval', data=np.array([1, -1]),
+                                    timestamps=[0.5, 1], pattern=hp)
+        assert ps.data.dtype == np.int8
+        assert ps.timestamps.dtype == np.float64
+
+        ps.add_interval(2, 3)
+        data = ps.data
+        assert np.shares_memory(data, ps.data)
+        np.testing.assert_array_equal(ps.data, [1, -1, 1, -1])
+        np.testing.assert_array_equal(ps.timestamps, [0.5, 1, 2, 3])
+
+        for i in range(100):
+            ps.add_interval(10 + i, 10.5 + i)
+        assert len(ps.data) == len(ps.timestamps) == 204
+        assert ps.num_samples == 204
+
+        ps = PhotostimulationSeries(name="series_2", format='series', data=[0, 1, 1], rate=10., stim_duration=0.05,
+                                    pattern=hp)
+        with self.assertRaises(ValueError):
+            ps.add_onset(1.)
+
+    def test_iterator_data(self):
+        '''Test that data read from an iterator is validated chunk by chunk, and can't be appended to.'''
+        hp = get_holographic_pattern()
+        data = DataChunkIterator(data=iter([1, -1, 1, 0]), buffer_size=2)
+        ps = PhotostimulationSeries(name="series_1", format='interval', data=data,
+                                    timestamps=[0.5, 1, 2, 3], pattern=hp)
+        np.testing.assert_array_equal(next(ps.data).data, [1, -1])
+        with self.assertRaises(ValueError):
+            ps.add_interval(4, 5)
+        with self.assertRaises(ValueError):
+            next(ps.data)
+
+        data = DataChunkIterator(data=iter([0, 1, 2]), buffer_size=2)
+        ps = PhotostimulationSeries(name="series_2", format='series', data=data, timestamps=[0.5, 1, 2],
+                                    stim_duration=0.1, pattern=hp)
+        next(ps.data)
+        with self.assertRaises(ValueError):
+            next(ps.data)
+
+    def test_iterator_queries(self):
+        '''Test that series with data or timestamps read from an iterator can't be queried.'''
+        hp = get_holographic_pattern()
+        message = ("Cannot query the presentations of PhotostimulationSeries with 'data' or 'timestamps' read from an "
+                   "iterator; read the file back before querying the series.")
+        data = DataChunkIterator(data=iter([1, -1, 1, -1]), buffer_size=2)
+        ps = PhotostimulationSeries(name="series_1", format='interval', data=data,
+                                    timestamps=[0.5, 1, 2, 3], pattern=hp)
+        timestamps = DataChunkIterator(data=iter([0.5, 1, 2]), buffer_size=2)
+        ps2 = PhotostimulationSeries(name="series_2", format='series', data=[1, 1, 1], timestamps=timestamps,
+                                     stim_duration=0.1, pattern=hp)
+        for series in (ps, ps2):
+            with self.assertRaisesWith(ValueError, message):
+                series.is_on(1.)
+            with self.assertRaisesWith(ValueError, message):
+                series.intervals_in(0., 1.)
+            with self.assertRaisesWith(ValueError, message):
+                series.get_intervals()
+
+    def test_appendable(self):
+        '''Test that an appendable series buffers presentations until written, and is written to resizable datasets.'''
+        hp = get_holographic_pattern()
+        ps = PhotostimulationSeries(name="series_1", format='interval', data=[1, -1], timestamps=[0.5, 1],
+                                    stim_duration=0.5, pattern=hp, appendable=True, chunk_size=8)
+        ps.add_onsets([2, 3])
+        ps.flush()
+        np.testing.assert_array_equal(ps.data, [1, -1, 1, -1, 1, -1])
+        np.testing.assert_array_equal(ps.timestamps, [0.5, 1, 2, 2.5, 3, 3.5])
+        assert ps.fields['data'].io_settings['maxshape'] == (None,)
+        assert ps.fields['data'].io_settings['chunks'] == (8,)
+
+        with self.assertRaises(ValueError):
+            PhotostimulationSeries(name="series_2", format='series', data=[0, 1], rate=10., stim_duration=0.05,
+                                   pattern=hp, appendable=True)
+
+    def test_appendable_accessors(self):
+        '''Test that reading 'data' and 'timestamps' of a written appendable series does not flush its buffer.'''
+        hp = get_holographic_pattern()
+        ps = PhotostimulationSeries(name="series_1", format='series', data=[1], timestamps=[0.5], stim_duration=0.1,
+                                    pattern=hp, appendable=True, chunk_size=8)
+        nwbfile = NWBFile(session_description='session_description', identifier='identifier',
+                          session_start_time=datetime.now(tzlocal()))
+        nwbfile.add_stimulus(ps)
+        with NWBHDF5IO('test.nwb', 'w') as io:
+            io.write(nwbfile)
+            dataset = ps.fields['data'].dataset
+            np.testing.assert_array_equal(dataset[:], [1])
+            ps.add_onsets([1, 2])
+            np.testing.assert_array_equal(ps.data, [1, 1, 1])
+            np.testing.assert_array_equal(ps.timestamps, [0.5, 1, 2])
+            assert dataset.shape == (1,)
+            ps.flush()
+            assert dataset.shape == (3,)
+            assert ps.data is dataset
+        os.remove('test.nwb')
+
+    def test_appendable_unflushed_warning(self):
+        '''Test that a written appendable series collected with presentations that were not flushed warns.'''
+        import gc
+        hp = get_holographic_pattern()
+        ps = PhotostimulationSeries(name="series_1", format='series', data=[1], timestamps=[0.5], stim_duration=0.1,
+                                    pattern=hp, appendable=True, chunk_size=8)
+        nwbfile = NWBFile(session_description='session_description', identifier='identifier',
+                          session_start_time=datetime.now(tzlocal()))
+        nwbfile.add_stimulus(ps)
+        with NWBHDF5IO('test.nwb', 'w') as io:
+            io.write(nwbfile)
+            ps.add_onsets([1, 2])
+        with self.assertWarns(UserWarning):
+            del ps, nwbfile, io, hp
+            gc.collect()
+        os.remove('test.nwb')
+
     def test_add_onset(self):
         '''Test 'add_onset' method on both 'interval' and 'series' formatted PhotostimulationSeries.'''
         hp = get_holographic_pattern()
@@ -247,6 +635,87 @@ class TestPhotostimulationSeries(TestCase):
         assert all(ps.timestamps == np.array([10., 12., 30., 32., 40., 42., 50., 52.]))
         assert all(ps.data == np.array([ 1., -1.,  1., -1.,  1., -1.,  1., -1.]))
 
+    def test_get_intervals(self):
+        '''Test that 'get_intervals' returns the start and stop times for each format, and is cached until appended to.'''
+        hp = get_holographic_pattern()
+        ps = PhotostimulationSeries(name="series_1", format='interval', pattern=hp, data=[1, -1, 1, -1],
+                                    timestamps=[0.5, 1, 2, 4])
+        intervals = ps.get_intervals()
+        assert intervals.dtype == np.float64
+        np.testing.assert_array_equal(intervals, [[0.5, 1], [2, 4]])
+        assert ps.get_intervals() is intervals
+        with self.assertRaises(ValueError):
+            intervals[0, 0] = 0
+        ps.add_interval(5, 6)
+        np.testing.assert_array_equal(ps.get_intervals(), [[0.5, 1], [2, 4], [5, 6]])
+        assert ps._get_start_stop_list() == [(0.5, 1), (2, 4), (5, 6)]
+
+        ps = PhotostimulationSeries(name="series_2", pattern=hp, format='series', data=[0, 0, 0, 1, 1, 0],
+                                    rate=10., stim_duration=4)
+        np.testing.assert_allclose(ps.get_intervals(), [[0.3, 4.3], [0.4, 4.4]])
+
+        ps = PhotostimulationSeries(name="series_3", pattern=hp, format='series', stim_duration=0.05,
+                                    data=[0, 0, 0, 1, 1, 0], timestamps=[0, 0.5, 1, 1.5, 3, 6])
+        np.testing.assert_allclose(ps.get_intervals(), [[1.5, 1.55], [3, 3.05]])
+
+        ps = PhotostimulationSeries(name="series_4", format='interval', pattern=hp)
+        assert ps.get_intervals().shape == (0, 2)
+
+    def test_rasterize(self):
+        '''Test 'rasterize' on a regular timeline and at given sample times, matching 'is_on'.'''
+        hp = get_holographic_pattern()
+        ps = PhotostimulationSeries(name="series_1", format='interval', data=[1, -1, 1, -1, 1, -1],
+                                    timestamps=[0.1, 0.3, 0.25, 0.5, 0.8, 0.81], pattern=hp)
+        np.testing.assert_array_equal(ps.rasterize(rate=10), [0, 1, 1, 1, 1, 0, 0, 0, 1])
+        np.testing.assert_array_equal(ps.rasterize(rate=10, start=0.5, stop=1.2), [0, 0, 0, 1, 0, 0, 0])
+        sample_times = np.random.rand(100)
+        np.testing.assert_array_equal(ps.rasterize(sample_times=sample_times), ps.is_on(sample_times))
+
+        with self.assertRaises(ValueError):
+            ps.rasterize()
+        with self.assertRaises(ValueError):
+            ps.rasterize(rate=10, sample_times=sample_times)
+
+    def test_format_conversion(self):
+        '''Test conversion between the 'interval' and 'series' formats.'''
+        hp = get_holographic_pattern()
+        ps = PhotostimulationSeries(name="series_1", pattern=hp, format='series', stim_duration=0.05,
+                                    data=[0, 0, 0, 1, 1, 0], timestamps=[0, 0.5, 1, 1.5, 3, 6])
+        interval_series = ps.to_interval_format()
+        assert interval_series.format == 'interval'
+        assert interval_series.pattern is hp
+        np.testing.assert_array_equal(interval_series.data, [1, -1, 1, -1])
+        np.testing.assert_allclose(interval_series.timestamps, [1.5, 1.55, 3, 3.05])
+
+        series = interval_series.to_series_format(rate=100., name="series_2")
+        assert series.name == "series_2"
+        assert series.stim_duration == 0.01
+        np.testing.assert_array_equal(np.flatnonzero(series.data), [150, 151, 152, 153, 154, 300, 301, 302, 303, 304])
+        np.testing.assert_allclose(series.get_intervals()[[0, -1]], [[1.5, 1.51], [3.04, 3.05]])
+
+    def test_interval_index(self):
+        '''Test 'is_on' and 'intervals_in' on 'interval', 'series', and rate-based series, and after adding intervals.'''
+        hp = get_holographic_pattern()
+        ps = PhotostimulationSeries(name="series_1", format='interval', data=[1, -1, 1, -1, 1, -1],
+                                    timestamps=[1, 2, 3, 8, 4, 5], pattern=hp)
+        np.testing.assert_array_equal(ps.is_on([0, 1, 1.5, 2, 2.5, 3, 4.5, 6, 8, 9]),
+                                      [False, True, True, False, False, True, True, True, False, False])
+        assert ps.is_on(1.5) is True
+        np.testing.assert_array_equal(ps.intervals_in(2, 4), [[3, 8]])
+        np.testing.assert_array_equal(ps.intervals_in(1.5, 4.5), [[1, 2], [3, 8], [4, 5]])
+        assert ps.intervals_in(8, 10).shape == (0, 2)
+
+        ps.add_interval(10, 11)
+        assert ps.is_on(10.5)
+        np.testing.assert_array_equal(ps.intervals_in(8, 12), [[10, 11]])
+
+        ps = PhotostimulationSeries(name="series_2", format='series', data=[0, 1, 0, 1], rate=10.,
+                                    stim_duration=0.05, pattern=hp)
+        np.testing.assert_array_equal(ps.is_on([0.1, 0.12, 0.2, 0.32, 0.36]), [True, True, False, True, False])
+
+        ps = PhotostimulationSeries(name="series_3", format='interval', pattern=hp)
+        assert not ps.is_on([1.]).any()
+
     def test_to_df(self):
         '''Test conversion to Pandas dataframe, showing data and timestamps in each columns.'''
         hp = get_holographic_pattern()
@@ -279,6 +748,42 @@ class TestPhotostimulationSeries(TestCase):
                                                   data=[0, 0, 0, 1, 1, 0], timestamps=[0, 0.5, 1, 1.5, 3, 6])
         ps._get_start_stop_list()
 
+class TestPatternRegistry(TestCase):
+    def test_intern(self):
+        '''Check that series constructed with a registry share patterns and methods with the same content.'''
+        registry = PatternRegistry()
+        mask = np.zeros((20, 20))
+        mask[5:10, 5:10] = 1
+
+        def make_pattern(name, mask, **kwargs):
+            method = PhotostimulationMethod(name="method", stimulus_method="scanless", power_per_target=8.)
+            method.add_laser(Laser(name='laser', model='Coherent', wavelength=kwargs.pop('wavelength', 1030)))
+            return HolographicPattern(name=name, image_mask_roi=mask, method=method, **kwargs)
+
+        patterns = [make_pattern('a', mask), make_pattern('b', mask.astype(int).tolist()),
+                    make_pattern('c', mask, stim_duration=0.5), make_pattern('d', mask, wavelength=920),
+                    make_pattern('e', 1 - mask)]
+        series = [PhotostimulationSeries(name=f"series_{i}", format='interval', pattern=pattern,
+                                         pattern_registry=registry) for i, pattern in enumerate(patterns)]
+
+        assert [s.pattern for s in series] == [patterns[0], patterns[0], patterns[2], patterns[3], patterns[4]]
+        assert registry.patterns == [patterns[0], patterns[2], patterns[3], patterns[4]]
+        assert len(registry) == 4
+        # the method of every distinct pattern is registered, and equal methods are shared by their first pattern
+        assert registry.methods == [patterns[0].method, patterns[3].method]
+        assert registry.intern_method(patterns[4].method) is patterns[0].method
+
+        pixel_roi = [[10, 10], [30, 40]]
+        pattern = HolographicPattern(name='f', pixel_roi=pixel_roi, roi_size=5, dimension=[50, 50],
+                                     method=registry.intern_method(patterns[4].method))
+        assert pattern.method is patterns[0].method
+        same = HolographicPattern(name='g', pixel_roi=np.array(pixel_roi, dtype=float), roi_size=5.,
+                                  dimension=(50, 50), method=patterns[0].method)
+        assert registry.intern(pattern) is pattern
+        assert registry.intern(same) is pattern
+        assert registry.intern(patterns[1]) is patterns[0]
+
+
 class TestPhotostimulationTable(TestCase):
     def test_init(self):
         '''Test PhotostimulationTable initialization.'''
@@ -313,6 +818,178 @@ class TestPhotostimulationTable(TestCase):
         with NWBHDF5IO(self.path, "w") as io:
             io.write(nwbfile)
 
+    def test_add_series_iterator(self):
+        '''Test that a series read from data chunk iterators is read into memory when added to a table.'''
+        hp = get_holographic_pattern()
+        ps = PhotostimulationSeries(name="series_1", format='interval',
+                                    data=DataChunkIterator(data=iter([1, -1, 1, -1]), buffer_size=3),
+                                    timestamps=DataChunkIterator(data=iter([0.5, 1., 2., 4.]), buffer_size=3),
+                                    pattern=hp)
+        table = PhotostimulationTable(name='test', description='test desc')
+        table.add_series(ps)
+
+        np.testing.assert_array_equal(ps.data, [1, -1, 1, -1])
+        np.testing.assert_array_equal(ps.timestamps, [0.5, 1, 2, 4])
+        assert table['num_samples'].data[0] == 4
+        assert table['stop_time'].data[0] == 4.
+
+        ps = PhotostimulationSeries(name="series_2", format='interval',
+                                    data=DataChunkIterator(data=iter([1, -1, -1]), buffer_size=2),
+                                    timestamps=[0.5, 1., 2.], pattern=hp)
+        with self.assertRaises(ValueError):
+            table.add_series(ps)
+
+    def test_add_series_bulk(self):
+        '''Test that adding many series at once gives the same table as adding them row by row.'''
+        hp = get_holographic_pattern()
+        series = [PhotostimulationSeries(name=f"series_{i}", format='interval', data=[1, -1], timestamps=[i, i + 1.],
+                                         pattern=hp) for i in range(6)]
+        series += [PhotostimulationSeries(name=f"series_{i}", format='series', data=[0, 1, 1], rate=10.,
+                                          starting_time=float(i), stim_duration=0.05, pattern=hp)
+                   for i in range(6, 9)]
+
+        bulk = PhotostimulationTable(name='test', description='test desc')
+        bulk.add_series(series[:3])
+        bulk.add_series(series[3:], row_name=[f"row_{i}" for i in range(3, 9)])
+
+        rows = PhotostimulationTable(name='test', description='test desc')
+        row_names = [f"series_{i}" for i in range(3)] + [f"row_{i}" for i in range(3, 9)]
+        for s, row_name in zip(series, row_names):
+            rows.add_row(row_name=row_name, series=s, series_name=s.name, series_format=s.format,
+                         num_samples=s.num_samples, start_time=float(s._get_start_time()),
+                         stop_time=float(s._get_end_time()), pattern_name=s.pattern.name,
+                         method_name=s.pattern.method.name)
+
+        assert bulk.colnames == rows.colnames
+        assert list(bulk.id.data) == list(rows.id.data)
+        for name in rows.colnames:
+            assert list(bulk[name].data) == list(rows[name].data)
+
+        with self.assertRaises(ValueError):
+            bulk.add_series([series[0], PhotostimulationSeries(name="empty", format='interval', pattern=hp)])
+        assert len(bulk) == 9
+
+    def test_summarize(self):
+        '''Test the per-row presentation summary, and persisting it as columns that are kept up to date.'''
+        hp = get_holographic_pattern()
+        sp = PhotostimulationTable(name='test', description='test desc')
+        s1 = get_series()
+        s2 = PhotostimulationSeries(name="series_2", format='series', stim_duration=0.5, data=[1, 0, 1, 1],
+                                    timestamps=[1, 2, 4, 5], pattern=hp)
+        s3 = PhotostimulationSeries(name="series_3", format='series', stim_duration=0.5, data=[0, 1],
+                                    timestamps=[1, 2], pattern=hp)
+        sp.add_series([s1, s2, s3])
+
+        summary = sp.summarize()
+        np.testing.assert_array_equal(summary['num_presentations'], [2, 3, 1])
+        np.testing.assert_allclose(summary['total_on_time'], [2.5, 1.5, 0.5])
+        np.testing.assert_allclose(summary['duty_cycle'], [2.5 / 3.5, 1.5 / 4.5, 1])
+        np.testing.assert_allclose(summary['min_isi'], [1.5, 1, np.nan])
+        np.testing.assert_allclose(summary['mean_isi'], [1.5, 2, np.nan])
+        np.testing.assert_allclose(summary['first_onset'], [0.5, 1, 2])
+        np.testing.assert_allclose(summary['last_offset'], [4, 5.5, 2.5])
+        assert 'num_presentations' not in sp.colnames
+
+        sp.summarize(persist=True)
+        for name in PhotostimulationTable.summary_columns:
+            np.testing.assert_allclose(sp[name].data, summary[name])
+
+        sp.add_series([s2], row_name=['row_3'])
+        np.testing.assert_array_equal(sp['num_presentations'].data, [2, 3, 1, 3])
+        np.testing.assert_allclose(sp['mean_isi'].data, [1.5, 2, np.nan, 2])
+
+    def test_active_at(self):
+        '''Test finding the rows active at given times or in given windows, matching a direct search.'''
+        hp = get_holographic_pattern()
+        sp = PhotostimulationTable(name='test', description='test desc')
+        s1 = get_series()
+        s2 = PhotostimulationSeries(name="series_2", format='series', stim_duration=0.05, data=[1, 1, 1],
+                                    timestamps=[0.6, 2.1, 5], pattern=hp)
+        s3 = PhotostimulationSeries(name="series_3", format='interval', data=[1, -1, 1, -1],
+                                    timestamps=[0, 10, 3, 3.5], pattern=hp)
+        sp.add_series([s1, s2, s3])
+
+        np.testing.assert_array_equal(sp.active_at(0.62), [0, 1, 2])
+        np.testing.assert_array_equal(sp.active_at(1), [2])
+        np.testing.assert_array_equal(sp.overlapping(4, 5), [2])
+        np.testing.assert_array_equal(sp.overlapping(4, 5.01), [1, 2])
+
+        intervals = [s.get_intervals() for s in (s1, s2, s3)]
+        times = np.random.uniform(-1, 11, 50)
+        for t, rows in zip(times, sp.active_at(times)):
+            expected = [i for i, iv in enumerate(intervals) if np.any((iv[:, 0] <= t) & (iv[:, 1] > t))]
+            np.testing.assert_array_equal(rows, expected)
+        t1 = times + np.random.uniform(0, 1, 50)
+        for t, u, rows in zip(times, t1, sp.overlapping(times, t1)):
+            expected = [i for i, iv in enumerate(intervals) if np.any((iv[:, 0] < u) & (iv[:, 1] > t))]
+            np.testing.assert_array_equal(rows, expected)
+
+        sp.add_series([get_series()])
+        np.testing.assert_array_equal(sp.active_at(0.62), [0, 1, 2, 3])
+
+    def test_align_to(self):
+        '''Test aligning all presentations in the table to imaging frames, from timestamps in memory or in a file.'''
+        hp = get_holographic_pattern()
+        sp = PhotostimulationTable(name='test', description='test desc')
+        s1 = get_series()
+        s2 = PhotostimulationSeries(name="series_2", format='series', stim_duration=0.05, data=[0, 1, 1, 0],
+                                    timestamps=[0, 1.5, 3, 6], pattern=hp)
+        sp.add_series([s1, s2])
+
+        frame_times = np.cumsum(np.random.uniform(0.02, 0.04, 300)) - 0.5
+        alignment = sp.align_to(frame_times, chunk_size=16)
+        np.testing.assert_array_equal(alignment['row'], [0, 0, 1, 1])
+        np.testing.assert_array_equal(alignment['onset_time'], [0.5, 2, 1.5, 3])
+        np.testing.assert_allclose(alignment['offset_time'], [1, 4, 1.55, 3.05])
+        for event in ('onset', 'offset'):
+            times = alignment[f'{event}_time']
+            frames = np.searchsorted(frame_times, times, side='right') - 1
+            np.testing.assert_array_equal(alignment[f'{event}_frame'], frames)
+            np.testing.assert_allclose(alignment[f'{event}_fraction'],
+                                       (times - frame_times[frames]) / (frame_times[frames + 1] - frame_times[frames]))
+
+        with h5py.File('test_align_to.h5', 'w') as f:
+            f.create_dataset('timestamps', data=frame_times, chunks=(16,))
+            file_alignment = sp.align_to(f['timestamps'], chunk_size=16)
+        os.remove('test_align_to.h5')
+        for key, value in alignment.items():
+            np.testing.assert_array_equal(file_alignment[key], value)
+
+        imaging = TimeSeries(name='imaging', data=np.zeros(200), unit='n.a.', rate=30., starting_time=0.1)
+        alignment = sp.align_to(imaging)
+        np.testing.assert_array_equal(alignment['onset_frame'], [12, 57, 42, 87])
+        np.testing.assert_allclose(alignment['onset_fraction'], [0, 0, 0, 0], atol=1e-9)
+
+    def test_extract_windows(self):
+        '''Test extracting windows around every onset from in-memory and file-backed data, matching direct indexing.'''
+        hp = get_holographic_pattern()
+        sp = PhotostimulationTable(name='test', description='test desc')
+        s1 = get_series()
+        s2 = PhotostimulationSeries(name="series_2", format='series', stim_duration=0.05, data=[1, 1, 1, 1],
+                                    timestamps=[0.02, 0.6, 1.01, 9.95], pattern=hp)
+        sp.add_series([s1, s2])
+
+        data = np.random.rand(1000, 3)
+        response = TimeSeries(name='response', data=data, unit='n.a.', rate=100.)
+        result = sp.extract_windows(response, pre=5, post=10, max_block_size=2000)
+        windows = result['windows']
+        assert windows.shape == (6, 3, 15)
+        np.testing.assert_array_equal(result['onset_sample'], [50, 200, 2, 60, 101, 995])
+        padded = np.vstack((np.full((5, 3), np.nan), data, np.full((10, 3), np.nan)))
+        for window, onset in zip(windows, result['onset_sample']):
+            np.testing.assert_array_equal(window, padded[onset:onset + 15].T)
+        with self.assertRaises(ValueError):
+            sp.extract_windows(response, pre=5, post=10, out=np.empty((6, 3, 14)))
+
+        with h5py.File('test_extract_windows.h5', 'w') as f:
+            f.create_dataset('data', data=data, chunks=(100, 3))
+            response = TimeSeries(name='response', data=f['data'], unit='n.a.', rate=100.)
+            out = np.empty_like(windows)
+            file_result = sp.extract_windows(response, pre=5, post=10, out=out, num_threads=2)
+        os.remove('test_extract_windows.h5')
+        assert file_result['windows'] is out
+        np.testing.assert_array_equal(out, windows)
+
     def test_plot_presentation_times(self):
         '''Check that PhotostimulationTable can be plotted correctly.'''
         ps_method = get_photostim_method()
@@ -339,3 +1016,273 @@ class TestPhotostimulationTable(TestCase):
 
         ax = sp.plot_presentation_times(xlim=[0, 2])
         plt.show()
+
+    def test_plot_presentation_times_merges_and_culls(self):
+        '''Check that presentations are drawn as one collection, culled to xlim, and merged below a pixel.'''
+        hp = get_holographic_pattern()
+        s1 = PhotostimulationSeries(name="series_1", format='interval', data=np.tile([1, -1], 1000),
+                                    timestamps=np.arange(2000) * 1e-4, pattern=hp)
+        s2 = PhotostimulationSeries(name="series_2", format='interval', data=[1, -1, 1, -1, 1, -1],
+                                    timestamps=[1, 2, 40, 50, 80, 90], pattern=hp)
+        sp = PhotostimulationTable(name='test', description='test desc')
+        sp.add_series([s1, s2])
+
+        ax = sp.plot_presentation_times()
+        assert len(ax.collections) == 1
+        assert len(ax.collections[0].get_paths()) == 4
+        np.testing.assert_array_equal(ax.get_xlim(), [0, 90])
+        np.testing.assert_allclose(ax.collections[0].get_paths()[0].vertices[:4, 0], [0, 0, 0.1999, 0.1999])
+        plt.close(ax.figure)
+
+        ax = sp.plot_presentation_times(xlim=[30, 60])
+        vertices = np.array([path.vertices[:4] for path in ax.collections[0].get_paths()])
+        np.testing.assert_array_equal(vertices[:, :, 0], [[40, 40, 50, 50]])
+        np.testing.assert_array_equal(vertices[:, :, 1], [[20, 28, 28, 20]])
+        plt.close(ax.figure)
+
+
+class TestHolographicPatternTable(TestCase):
+    def test_add_patterns(self):
+        '''Check that patterns are stored as pixel lists or targets and reconstructed, with a single method.'''
+        ps_method = get_photostim_method()
+        hp1 = HolographicPattern(name='hp1', image_mask_roi=np.eye(6), method=ps_method)
+        hp2 = HolographicPattern(name='hp2', pixel_roi=[[3, 3]], roi_size=3, dimension=[8, 10], method=ps_method,
+                                 stim_duration=0.2)
+        patterns = HolographicPatternTable()
+        patterns.add_patterns([hp1])
+        patterns.add_patterns([hp2], series_name=['series_2'], format=['series'])
+
+        assert list(patterns['pattern_name'].data) == ['hp1', 'hp2']
+        assert list(patterns['series_name'].data) == ['hp1', 'series_2']
+        np.testing.assert_array_equal(patterns['stim_duration'].data, [np.nan, 0.2])
+        np.testing.assert_array_equal(patterns['mask_shape'].data, [[6, 6], [10, 8]])
+        np.testing.assert_array_equal(patterns.pixel_mask_index.data, [6, 6])
+        np.testing.assert_array_equal(patterns.targets_index.data, [0, 1])
+        np.testing.assert_array_equal(patterns.roi_size.data, [3])
+        np.testing.assert_array_equal(patterns.get_pattern(1).pixel_roi, hp2.pixel_roi)
+        assert patterns.method is not ps_method
+        assert PatternRegistry.content_key(patterns.method) == PatternRegistry.content_key(ps_method)
+        for i, hp in enumerate([hp1, hp2]):
+            np.testing.assert_array_equal(patterns.get_pattern(i).image_mask, hp.image_mask)
+            assert patterns.get_pattern(i).method is patterns.method
+
+        mixed = HolographicPatternTable()
+        mixed.add_patterns([hp1, hp2])
+        np.testing.assert_array_equal(mixed.pixel_mask_index.data, [6, 6])
+        np.testing.assert_array_equal(mixed.targets_index.data, [0, 1])
+
+        hp3 = HolographicPattern(name='hp3', image_mask_roi=np.ones((2, 2, 2)), method=ps_method)
+        with self.assertRaises(ValueError):
+            patterns.add_patterns([hp3])
+        other_method = PhotostimulationMethod(name="methodB", stimulus_method="scanning")
+        with self.assertRaises(ValueError):
+            patterns.add_patterns([HolographicPattern(name='hp4', image_mask_roi=np.eye(6), method=other_method)])
+        assert len(patterns) == 2
+
+    def test_mask_shape(self):
+        '''Check that 'mask_shape' stores the shape of the masks of non-square patterns, as [height, width(, depth)].'''
+        ps_method = get_photostim_method()
+        patterns = HolographicPatternTable(method=ps_method)
+        patterns.add_patterns([HolographicPattern(name='mask', image_mask_roi=np.ones((4, 6)), method=ps_method),
+                               HolographicPattern(name='roi', pixel_roi=[[3, 3]], roi_size=3, dimension=[8, 10],
+                                                  method=ps_method)])
+        patterns.add_targets(targets=[[1, 2]], counts=[1], roi_size=3, dimension=[8, 10])
+
+        np.testing.assert_array_equal(patterns['mask_shape'].data, [[4, 6], [10, 8], [10, 8]])
+        assert patterns.get_mask(0).shape == (4, 6)
+        assert patterns.get_mask(1).shape == (10, 8)
+        np.testing.assert_array_equal(patterns.get_pattern(2).dimension, [8, 10])
+
+        volumes = HolographicPatternTable(method=ps_method)
+        volumes.add_patterns([HolographicPattern(name='volume', image_mask_roi=np.ones((4, 6, 2)), method=ps_method)])
+        np.testing.assert_array_equal(volumes['mask_shape'].data, [[4, 6, 2]])
+
+    def test_add_targets(self):
+        '''Check that patterns are added from their targets, and that masks are materialized with their weights.'''
+        ps_method = get_photostim_method()
+        hp = HolographicPattern(name='hp', pixel_roi=[[1, 2], [6, 3]], roi_size=[3, 2], dimension=[8, 10],
+                                method=ps_method)
+        patterns = HolographicPatternTable(method=ps_method)
+        patterns.add_targets(targets=[[2, 2], [4, 7], [5, 5]], counts=[1, 0, 2], roi_size=3, dimension=[8, 10],
+                             weights=[0.5, 1., 2.])
+        patterns.add_patterns([hp])
+
+        assert list(patterns['pattern_name'].data) == ['pattern0', 'pattern1', 'pattern2', 'hp']
+        np.testing.assert_array_equal(patterns.targets_index.data, [1, 1, 3, 5])
+        np.testing.assert_array_equal(patterns.roi_size_index.data, [1, 2, 3, 5])
+        np.testing.assert_array_equal(patterns.targets.data['z'], 0)
+
+        masks = patterns.get_masks([3, 0, 1])
+        assert masks.shape == (3, 10, 8)
+        np.testing.assert_array_equal(masks[0], hp.image_mask)
+        circle = HolographicPattern(name='circle', pixel_roi=[[2, 2]], roi_size=3, dimension=[8, 10],
+                                    method=ps_method)
+        np.testing.assert_array_equal(masks[1], 0.5 * circle.image_mask)
+        np.testing.assert_array_equal(masks[2], 0)
+        assert patterns.get_mask(2)[5, 5] == 2.
+        np.testing.assert_array_equal(patterns.get_pattern(2).pixel_roi, [[4, 7], [5, 5]])
+
+        with self.assertRaises(ValueError):
+            patterns.add_targets(targets=[[2, 2]], counts=[2], roi_size=3, dimension=[8, 10])
+        with self.assertRaises(ValueError):
+            patterns.add_targets(targets=[[2, 2, 2]], counts=[1], roi_size=3, dimension=[8, 10, 2])
+        patterns.add_targets(targets=[[2, 2]], counts=[1], roi_size=3, dimension=[6, 6])
+        with self.assertRaises(ValueError):
+            patterns.get_masks([0, 4])
+
+
+class TestPhotostimulationEventTable(TestCase):
+    def test_add_events(self):
+        '''Check that events are added in bulk and validated.'''
+        patterns = HolographicPatternTable()
+        patterns.add_patterns([get_holographic_pattern(), get_holographic_pattern()])
+        events = PhotostimulationEventTable(name='events', patterns=patterns)
+        events.add_events([0, 1], [0., 1.], [0.5, 1.5], power=[2., 3.])
+        events.add_events(np.array([1]), np.array([2.]), np.array([2.5]), power=np.array([4.]))
+
+        assert events.pattern.table is patterns
+        np.testing.assert_array_equal(events.id.data, [0, 1, 2])
+        np.testing.assert_array_equal(events['pattern'].data, [0, 1, 1])
+        np.testing.assert_array_equal(events['onset'].data, [0, 1, 2])
+        np.testing.assert_array_equal(events['offset'].data, [0.5, 1.5, 2.5])
+        np.testing.assert_array_equal(events['power'].data, [2, 3, 4])
+
+        # rows are appended in place, without copying the rows already in the table
+        onset = events['onset'].data
+        events.add_events([0], [3.], [3.5], power=[1.])
+        assert np.shares_memory(events['onset'].data, onset)
+        np.testing.assert_array_equal(events['onset'].data, [0, 1, 2, 3])
+        np.testing.assert_array_equal(events.id.data, [0, 1, 2, 3])
+
+        with self.assertRaises(ValueError):
+            events.add_events([0], [1.], [0.5], power=[1.])
+        with self.assertRaises(ValueError):
+            events.add_events([2], [1.], [1.5], power=[1.])
+        with self.assertRaises(ValueError):
+            events.add_events([0], [1.], [1.5])
+        with self.assertRaises(ValueError):
+            events.add_events([0, 1], [1.], [1.5], power=[1.])
+
+    def test_convert_photostimulation_table(self):
+        '''Check that a PhotostimulationTable is converted to an event table and back.'''
+        hp = get_holographic_pattern()
+        s1 = get_series()
+        s2 = PhotostimulationSeries(name="series_2", format='series', stim_duration=0.05,
+                                    data=[0, 1, 0, 1], timestamps=[0, 0.5, 1, 3], pattern=hp)
+        table = PhotostimulationTable(name='test', description='test desc')
+        table.add_series([s1, s2])
+
+        events = PhotostimulationEventTable.from_photostimulation_table(table)
+        assert events.name == 'test'
+        np.testing.assert_array_equal(events['pattern'].data, [0, 0, 1, 1])
+        np.testing.assert_array_equal(events['onset'].data, [0.5, 2, 0.5, 3])
+        np.testing.assert_array_equal(events['offset'].data, [1, 4, 0.55, 3.05])
+        np.testing.assert_array_equal(events['power'].data, [8, 8, 8, 8])
+
+        converted = events.to_photostimulation_table(name='converted')
+        assert converted.name == 'converted'
+        assert list(converted['series_name'].data) == ['series_1', 'series_2']
+        c1, c2 = converted.series[:]
+        np.testing.assert_array_equal(c1.data, s1.data)
+        np.testing.assert_array_equal(c1.timestamps, s1.timestamps)
+        assert c2.format == 'series' and c2.stim_duration == 0.05
+        np.testing.assert_array_equal(c2.get_intervals(), s2.get_intervals())
+        np.testing.assert_array_equal(c2.pattern.image_mask, hp.image_mask)
+
+    def test_convert_different_powers(self):
+        '''Check that series whose methods differ only in their power are converted, keeping the power of each.'''
+        s1 = get_series()
+        method = PhotostimulationMethod(name="methodB", stimulus_method="scanless", sweep_pattern="none",
+                                        sweep_size=0, time_per_sweep=0, num_sweeps=0, power_per_target=5.,
+                                        opsin="testOpsin", slm=get_SLM(), laser=get_laser())
+        hp = HolographicPattern(name='pattern2', image_mask_roi=np.eye(5), method=method)
+        s2 = PhotostimulationSeries(name="series_2", format='interval', data=[1, -1], timestamps=[0, 3], pattern=hp)
+        table = PhotostimulationTable(name='test', description='test desc')
+        table.add_series([s1, s2])
+
+        events = PhotostimulationEventTable.from_photostimulation_table(table)
+        np.testing.assert_array_equal(events['pattern'].data, [0, 0, 1])
+        np.testing.assert_array_equal(events['power'].data, [8, 8, 5])
+
+        c1, c2 = events.to_photostimulation_table().series[:]
+        assert c1.pattern.method.power_per_target == 8.
+        assert c2.pattern.method.power_per_target == 5.
+        np.testing.assert_array_equal(c2.pattern.method.slm.size, s1.pattern.method.slm.size)
+        np.testing.assert_array_equal(c2.pattern.image_mask, hp.image_mask)
+
+        other = PhotostimulationMethod(name="methodC", stimulus_method="scanning", power_per_target=8.)
+        with self.assertRaises(ValueError):
+            events.patterns.add_patterns([HolographicPattern(name='hp', image_mask_roi=np.eye(5), method=other)])
+
+
+class TestImport(TestCase):
+    def test_import_is_lazy(self):
+        '''Check that importing ndx_photostim does not import matplotlib, which is only needed for plotting.'''
+        code = "import sys, ndx_photostim; print('matplotlib' in sys.modules)"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+        assert output.stdout.strip() == 'False'
+
+
+class TestProfiler(TestCase):
+    def test_profiler(self):
+        '''Check that a Profiler records calls to the public methods only while enabled.'''
+        from ndx_photostim.profiling import Profiler
+        add_onset = PhotostimulationSeries.add_onset
+        image_to_pixel = HolographicPattern.__dict__['image_to_pixel']
+        hp = get_holographic_pattern()
+
+        with Profiler() as outer:
+            series = PhotostimulationSeries(name="series", format='interval', pattern=hp, stim_duration=0.5)
+            with Profiler(memory=False) as inner:
+                series.add_onset([1, 2, 3])
+                series.add_onset(4)
+                HolographicPattern.image_to_pixel(np.ones((100, 100)))
+            assert PhotostimulationSeries.add_onset is not add_onset
+        assert PhotostimulationSeries.add_onset is add_onset
+        assert HolographicPattern.__dict__['image_to_pixel'] is image_to_pixel
+
+        stats = outer.to_dict()
+        assert stats['PhotostimulationSeries.__init__']['calls'] == 1
+        assert stats['PhotostimulationSeries.add_onset']['calls'] == 2
+        assert stats['PhotostimulationSeries.add_intervals']['calls'] == 2
+        assert stats['PhotostimulationSeries.add_onset']['time'] >= stats['PhotostimulationSeries.add_intervals']['time']
+        assert stats['HolographicPattern.image_to_pixel']['peak'] >= 100 * 100 * 8
+        assert 'PhotostimulationSeries.__init__' not in inner.to_dict()
+        assert inner.to_dict()['HolographicPattern.image_to_pixel']['peak'] == 0
+        report = inner.report(sort_by='calls').splitlines()
+        assert report[0].split()[:3] == ['method', 'calls', 'time']
+        assert report[-1].split()[:2] == ['HolographicPattern.image_to_pixel', '1']
+        np.testing.assert_array_equal(series.timestamps, [1, 1.5, 2, 2.5, 3, 3.5, 4, 4.5])
+
+        with self.assertRaises(ValueError):
+            outer.disable()
+
+    def test_profiler_without_reset_peak(self):
+        '''Check that memory is recorded on Python versions where tracemalloc cannot reset its peak.'''
+        from unittest import mock
+        from ndx_photostim import profiling
+        with mock.patch.object(profiling, '_can_reset_peak', False), \
+                mock.patch.object(profiling.tracemalloc, 'reset_peak', side_effect=AttributeError):
+            with profiling.Profiler() as profiler:
+                pixel_mask = HolographicPattern.image_to_pixel(np.ones((100, 100)))
+        stats = profiler.to_dict()['HolographicPattern.image_to_pixel']
+        assert stats['calls'] == 1
+        assert stats['peak'] == stats['allocated'] >= pixel_mask.nbytes
+
+    def test_profiler_threads(self):
+        '''Check that calls made from several threads are all recorded.'''
+        from concurrent.futures import ThreadPoolExecutor
+        from ndx_photostim.profiling import Profiler
+        with Profiler(memory=False) as profiler:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda _: HolographicPattern.image_to_pixel(np.eye(4)), range(2000)))
+        assert profiler.to_dict()['HolographicPattern.image_to_pixel']['calls'] == 2000
+
+    def test_profile_from_environment(self):
+        '''Check that setting NDX_PHOTOSTIM_PROFILE prints a report at exit.'''
+        code = ("import numpy as np, ndx_photostim; "
+                "ndx_photostim.HolographicPattern.image_to_pixel(np.ones((5, 5)))")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path), NDX_PHOTOSTIM_PROFILE='1')
+        output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+        assert 'HolographicPattern.image_to_pixel' in output.stderr
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 import os.path
 
-from pynwb.spec import NWBNamespaceBuilder, NWBGroupSpec, NWBAttributeSpec, NWBLinkSpec, NWBDatasetSpec, NWBRefSpec, export_spec
+from pynwb.spec import NWBNamespaceBuilder, NWBGroupSpec, NWBAttributeSpec, NWBLinkSpec, NWBDatasetSpec, NWBRefSpec, \
+    NWBDtypeSpec, export_spec
 
 
 def main():
@@ -27,6 +28,7 @@ def main():
     ns_builder.include_type("DynamicTable", namespace="hdmf-common")
     ns_builder.include_type("DynamicTableRegion", namespace="hdmf-common")
     ns_builder.include_type("VectorData", namespace="hdmf-common")
+    ns_builder.include_type("VectorIndex", namespace="hdmf-common")
     ns_builder.include_type("Data", namespace="hdmf-common")
     ns_builder.include_type("ElementIdentifiers", namespace="hdmf-common")
     ns_builder.include_type("Device", namespace="core")
@@ -215,6 +217,7 @@ def main():
                 doc=("ROIs designated using a mask of size [width, height] (2D stimulation) or ["
                      "width, height, depth] (3D stimulation), where for a given pixel a value of 1 "
                      "indicates stimulation, and a value of 0 indicates no stimulation."),
+                dtype='uint8',
                 quantity='?',
                 dims=(('num_rows', 'num_cols'), ('num_rows', 'num_cols', 'depth')),
                 shape=([None] * 2, [None] * 3)
@@ -287,7 +290,174 @@ def main():
         ]
     )
 
-    new_data_types = [slm, lsr, psm, hp, ps, pt]
+    ########################################################################################################################
+    mask_coordinates = [
+        NWBDtypeSpec(name='x', doc=("Index of the pixel along the first axis of the mask."), dtype='uint32'),
+        NWBDtypeSpec(name='y', doc=("Index of the pixel along the second axis of the mask."), dtype='uint32'),
+    ]
+    mask_weight = NWBDtypeSpec(name='weight', doc=("Weight of the pixel."), dtype='float32')
+
+    hpt = NWBGroupSpec(
+        neurodata_type_def='HolographicPatternTable',
+        neurodata_type_inc='DynamicTable',
+        doc=("Table of holographic patterns, with one row per pattern. Each pattern is stored either as the list "
+             "of pixels (or voxels) it stimulates, or as the centers, size and weights of its targets, so that a "
+             "large number of patterns is stored in a few contiguous datasets."),
+        datasets=[
+            NWBDatasetSpec(
+                name='pattern_name',
+                doc=("Name of the pattern."),
+                neurodata_type_inc='VectorData',
+                dtype='text'
+            ),
+            NWBDatasetSpec(
+                name='series_name',
+                doc=("Name of the PhotostimulationSeries presenting the pattern."),
+                neurodata_type_inc='VectorData',
+                dtype='text'
+            ),
+            NWBDatasetSpec(
+                name='format',
+                doc=("Format of the PhotostimulationSeries presenting the pattern ('interval' or 'series')."),
+                neurodata_type_inc='VectorData',
+                dtype='text'
+            ),
+            NWBDatasetSpec(
+                name='stim_duration',
+                doc=("Duration (in sec) the stimulus is presented following onset, or NaN if not specified."),
+                neurodata_type_inc='VectorData',
+                dtype='float64'
+            ),
+            NWBDatasetSpec(
+                name='mask_shape',
+                doc=("Shape of the dense mask of the pattern, i.e., the number of pixels along its first, second "
+                     "(and third) axes: [height, width] or [height, width, depth]."),
+                neurodata_type_inc='VectorData',
+                dtype='uint32',
+                dims=(('num_patterns', 'height|width'), ('num_patterns', 'height|width|depth')),
+                shape=((None, 2), (None, 3))
+            ),
+            NWBDatasetSpec(
+                name='pixel_mask',
+                doc=("Pixels stimulated by each 2D pattern."),
+                neurodata_type_inc='VectorData',
+                dtype=mask_coordinates + [mask_weight],
+                quantity='?'
+            ),
+            NWBDatasetSpec(
+                name='pixel_mask_index',
+                doc=("Index into pixel_mask."),
+                neurodata_type_inc='VectorIndex',
+                quantity='?'
+            ),
+            NWBDatasetSpec(
+                name='voxel_mask',
+                doc=("Voxels stimulated by each 3D pattern."),
+                neurodata_type_inc='VectorData',
+                dtype=mask_coordinates + [
+                    NWBDtypeSpec(name='z', doc=("Index of the voxel along the third axis of the mask."),
+                                 dtype='uint32'),
+                    mask_weight
+                ],
+                quantity='?'
+            ),
+            NWBDatasetSpec(
+                name='voxel_mask_index',
+                doc=("Index into voxel_mask."),
+                neurodata_type_inc='VectorIndex',
+                quantity='?'
+            ),
+            NWBDatasetSpec(
+                name='targets',
+                doc=("Targets of each pattern specified by the centers of its ROIs, as in the 'pixel_roi' of a "
+                     "HolographicPattern."),
+                neurodata_type_inc='VectorData',
+                dtype=[
+                    NWBDtypeSpec(name='x', doc=("Position of the center of the target along the width of the "
+                                                "pattern."), dtype='float32'),
+                    NWBDtypeSpec(name='y', doc=("Position of the center of the target along the height of the "
+                                                "pattern."), dtype='float32'),
+                    NWBDtypeSpec(name='z', doc=("Position of the center of the target along the depth of the "
+                                                "pattern, or 0 for 2D patterns."), dtype='float32'),
+                    NWBDtypeSpec(name='weight', doc=("Weight of the target."), dtype='float32'),
+                ],
+                quantity='?'
+            ),
+            NWBDatasetSpec(
+                name='targets_index',
+                doc=("Index into targets."),
+                neurodata_type_inc='VectorIndex',
+                quantity='?'
+            ),
+            NWBDatasetSpec(
+                name='roi_size',
+                doc=("Size of the targets of each pattern, as in the 'roi_size' of a HolographicPattern: a single "
+                     "value for circles (or cylinders), the width and height of rectangles, or the width, height "
+                     "and depth of cuboids. Empty for patterns stored as masks."),
+                neurodata_type_inc='VectorData',
+                dtype='float32',
+                quantity='?'
+            ),
+            NWBDatasetSpec(
+                name='roi_size_index',
+                doc=("Index into roi_size."),
+                neurodata_type_inc='VectorIndex',
+                quantity='?'
+            ),
+        ],
+        groups=[
+            NWBGroupSpec(
+                neurodata_type_inc='PhotostimulationMethod',
+                name='method',
+                doc=("Methods used to apply patterned photostimulation, shared by all patterns in the table."),
+                quantity='?'
+            ),
+        ]
+    )
+
+    pet = NWBGroupSpec(
+        neurodata_type_def='PhotostimulationEventTable',
+        neurodata_type_inc='DynamicTable',
+        doc=("Table of photostimulation events, with one row per presentation of a pattern. Stores the "
+             "presentations of any number of patterns in a few contiguous datasets, as an alternative to a "
+             "PhotostimulationSeries per pattern."),
+        quantity='?',
+        datasets=[
+            NWBDatasetSpec(
+                name='pattern',
+                doc=("Row of the pattern table of the pattern presented."),
+                neurodata_type_inc='DynamicTableRegion'
+            ),
+            NWBDatasetSpec(
+                name='onset',
+                doc=("Onset time (in seconds) of the presentation."),
+                neurodata_type_inc='VectorData',
+                dtype='float64'
+            ),
+            NWBDatasetSpec(
+                name='offset',
+                doc=("Offset time (in seconds) of the presentation."),
+                neurodata_type_inc='VectorData',
+                dtype='float64'
+            ),
+            NWBDatasetSpec(
+                name='power',
+                doc=("Power (in milliWatts) applied to each target during the presentation."),
+                neurodata_type_inc='VectorData',
+                dtype='float64',
+                quantity='?'
+            ),
+        ],
+        groups=[
+            NWBGroupSpec(
+                neurodata_type_inc='HolographicPatternTable',
+                name='patterns',
+                doc=("Table of the patterns presented."),
+            ),
+        ]
+    )
+
+    new_data_types = [slm, lsr, psm, hp, ps, pt, hpt, pet]
 
     # export the spec to yaml files in the spec folder
     output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'spec'))